@@ -0,0 +1,545 @@
+"""
+Plotly chart builders for the dashboard.
+
+Most charts depend only on the loaded datasets, so their figure is the same
+for every session and rerun. STATIC_CHARTS maps those chart names to their
+builder and the datasets they need; the figure cache uses it to pre-warm and
+serve these figures without rebuilding them. The Sales Analysis builders take
+already filtered results and are cached per date range.
+"""
+from functools import partial
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from downsampling import (SCATTER_POINT_BUDGET, TREND_POINT_BUDGET, WEBGL_THRESHOLD,
+                          bin_edges, box_stats, lttb, stratified_sample, voxel_thin)
+
+CLUSTER_LABELS = {
+    0: 'VIP Customers',
+    1: 'Loyal Customers',
+    2: 'At Risk',
+    3: 'Low Value'
+}
+
+CLUSTER_COLORS = {
+    'VIP Customers': 'gold',
+    'Loyal Customers': 'lightblue',
+    'At Risk': 'lightcoral',
+    'Low Value': 'lightgray'
+}
+
+
+# Overview
+def top_categories_bar(category_summary):
+    top_10 = category_summary.head(10)
+    fig = px.bar(
+        top_10,
+        x='total_orders',
+        y='category',
+        orientation='h',
+        labels={'total_orders': 'Number of Orders', 'category': 'Category'},
+        color='total_orders',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(showlegend=False, height=400, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def category_revenue_bar(category_summary):
+    top_10_revenue = category_summary.nlargest(10, 'total_revenue')
+    fig = px.bar(
+        top_10_revenue,
+        x='total_revenue',
+        y='category',
+        orientation='h',
+        labels={'total_revenue': 'Revenue (R$)', 'category': 'Category'},
+        color='total_revenue',
+        color_continuous_scale='Reds'
+    )
+    fig.update_layout(showlegend=False, height=400, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def top_states_subplots(state_summary):
+    top_states = state_summary.head(10)
+
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('Orders by State', 'Revenue by State'),
+        specs=[[{'type': 'bar'}, {'type': 'bar'}]]
+    )
+
+    fig.add_trace(
+        go.Bar(x=top_states['state'], y=top_states['total_orders'],
+               name='Orders', marker_color='skyblue'),
+        row=1, col=1
+    )
+
+    fig.add_trace(
+        go.Bar(x=top_states['state'], y=top_states['total_revenue'],
+               name='Revenue', marker_color='lightcoral'),
+        row=1, col=2
+    )
+
+    fig.update_layout(height=400, showlegend=False)
+    return fig
+
+
+def monthly_trend(monthly_sales, budget=TREND_POINT_BUDGET):
+    # Long series are reduced with LTTB (on order counts) and drawn with WebGL
+    keep = lttb(range(len(monthly_sales)), monthly_sales['order_id'], budget)
+    monthly_sales = monthly_sales.iloc[keep]
+    scatter = go.Scattergl if len(monthly_sales) > WEBGL_THRESHOLD else go.Scatter
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    fig.add_trace(
+        scatter(
+            x=monthly_sales['year_month'],
+            y=monthly_sales['order_id'],
+            name="Orders",
+            mode='lines+markers',
+            line=dict(color='blue', width=3)
+        ),
+        secondary_y=False
+    )
+
+    fig.add_trace(
+        scatter(
+            x=monthly_sales['year_month'],
+            y=monthly_sales['payment_value'],
+            name="Revenue (R$)",
+            mode='lines+markers',
+            line=dict(color='red', width=3)
+        ),
+        secondary_y=True
+    )
+
+    fig.update_xaxes(title_text="Month")
+    fig.update_yaxes(title_text="Number of Orders", secondary_y=False)
+    fig.update_yaxes(title_text="Revenue (R$)", secondary_y=True)
+    fig.update_layout(height=400, hovermode='x unified')
+    return fig
+
+
+# Sales Analysis
+def rollup_trend(series, level, budget=TREND_POINT_BUDGET):
+    # series: RollupStore.series() output, indexed by period start; edge
+    # periods clipped to the date range are drawn as open markers
+    keep = lttb(range(len(series)), series['orders'], budget)
+    series = series.iloc[keep]
+    scatter = go.Scattergl if len(series) > WEBGL_THRESHOLD else go.Scatter
+    mode = 'lines' if level == 'day' else 'lines+markers'
+    clipped = series['partial'].to_numpy(dtype=bool) if 'partial' in series else np.zeros(len(series), bool)
+    notes = [f"partial {level}, clipped to the date range" if is_clipped else f"{int(customers):,} customers"
+             for customers, is_clipped in zip(series['customers'], clipped)]
+    symbols = np.where(clipped, 'circle-open', 'circle')
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    fig.add_trace(
+        scatter(
+            x=series.index,
+            y=series['orders'],
+            customdata=notes,
+            name="Orders",
+            mode=mode,
+            line=dict(color='blue', width=2),
+            marker=dict(symbol=symbols, size=8),
+            hovertemplate="%{y:,} orders<br>%{customdata}<extra></extra>"
+        ),
+        secondary_y=False
+    )
+
+    fig.add_trace(
+        scatter(
+            x=series.index,
+            y=series['revenue'],
+            name="Revenue (R$)",
+            mode=mode,
+            line=dict(color='red', width=2),
+            marker=dict(symbol=symbols, size=8)
+        ),
+        secondary_y=True
+    )
+
+    fig.update_xaxes(title_text=level.title())
+    fig.update_yaxes(title_text="Number of Orders", secondary_y=False)
+    fig.update_yaxes(title_text="Revenue (R$)", secondary_y=True)
+    fig.update_layout(height=400, hovermode='x unified')
+    return fig
+
+
+def category_share_pie(category_counts):
+    fig = px.pie(
+        values=category_counts.values,
+        names=category_counts.index,
+        title="Top 10 Categories"
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=500)
+    return fig
+
+
+def binned_bar(counts, edges, **kwargs):
+    # Pre-binned histogram trace: only the bars are sent to the browser instead of every row
+    return go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), **kwargs)
+
+
+def binned_price_histogram(counts, edges, median):
+    fig = go.Figure(binned_bar(counts, edges, marker_color='#636EFA'))
+    fig.add_vline(
+        x=median,
+        line_dash="dash",
+        line_color="red",
+        annotation_text=f"Median: R$ {median:.2f}"
+    )
+    fig.update_layout(
+        title="Product Price Distribution",
+        xaxis_title='Price (R$)',
+        yaxis_title='Frequency',
+        bargap=0,
+        height=500
+    )
+    return fig
+
+
+def payment_methods_pie(payment_summary):
+    fig = px.pie(
+        payment_summary,
+        values='total_orders',
+        names='payment_type',
+        title="Payment Type Distribution"
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+
+# Geographic Analysis
+def state_orders_bar(state_summary):
+    top_15_states = state_summary.head(15)
+    fig = px.bar(
+        top_15_states,
+        x='total_orders',
+        y='state',
+        orientation='h',
+        title="Top 15 States by Orders",
+        labels={'total_orders': 'Number of Orders', 'state': 'State'},
+        color='total_orders',
+        color_continuous_scale='Blues'
+    )
+    fig.update_layout(height=600, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def state_revenue_bar(state_summary):
+    top_15_revenue = state_summary.nlargest(15, 'total_revenue')
+    fig = px.bar(
+        top_15_revenue,
+        x='total_revenue',
+        y='state',
+        orientation='h',
+        title="Top 15 States by Revenue",
+        labels={'total_revenue': 'Revenue (R$)', 'state': 'State'},
+        color='total_revenue',
+        color_continuous_scale='Reds'
+    )
+    fig.update_layout(height=600, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def top_cities_treemap(city_summary):
+    top_20_cities = city_summary.head(20)
+    fig = px.treemap(
+        top_20_cities,
+        path=['state', 'city'],
+        values='total_orders',
+        color='total_revenue',
+        title="Top 20 Cities - Orders & Revenue",
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(height=600)
+    return fig
+
+
+# Customer Analysis
+def rfm_histogram(rfm_df, column, nbins, label, color):
+    values = rfm_df[column].dropna()
+    counts, edges = np.histogram(values, bins=bin_edges(values, nbins))
+    fig = go.Figure(binned_bar(counts, edges, marker_color=color))
+    fig.add_vline(
+        x=values.median(),
+        line_dash="dash",
+        line_color="red"
+    )
+    fig.update_layout(xaxis_title=label, yaxis_title='count', bargap=0)
+    return fig
+
+
+def customers_by_state_bar(state_summary):
+    customer_by_state = state_summary.nlargest(15, 'total_customers')
+    fig = px.bar(
+        customer_by_state,
+        x='total_customers',
+        y='state',
+        orientation='h',
+        labels={'total_customers': 'Number of Customers', 'state': 'State'},
+        color='total_customers',
+        color_continuous_scale='Greens'
+    )
+    fig.update_layout(height=500, showlegend=False, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def review_scores_bar(review_summary):
+    fig = px.bar(
+        review_summary,
+        x='review_score',
+        y='count',
+        labels={'review_score': 'Review Score', 'count': 'Number of Reviews'},
+        color='review_score',
+        color_continuous_scale='RdYlGn'
+    )
+    fig.update_layout(height=400)
+    return fig
+
+
+# Delivery Performance
+def delivery_time_histogram(delivery_df, nbins=100):
+    # Both series share the bins so the overlaid bars line up
+    actual = delivery_df['actual_delivery_time'].dropna()
+    estimated = delivery_df['estimated_delivery_time'].dropna()
+    edges = bin_edges(np.concatenate([actual, estimated]), nbins)
+    fig = go.Figure()
+    fig.add_trace(binned_bar(
+        np.histogram(actual, bins=edges)[0], edges,
+        name='Actual Delivery Time',
+        opacity=0.7,
+        marker_color='blue'
+    ))
+    fig.add_trace(binned_bar(
+        np.histogram(estimated, bins=edges)[0], edges,
+        name='Estimated Delivery Time',
+        opacity=0.7,
+        marker_color='red'
+    ))
+    fig.update_layout(
+        barmode='overlay',
+        bargap=0,
+        xaxis_title='Days',
+        yaxis_title='Frequency',
+        height=400
+    )
+    return fig
+
+
+def delivery_diff_histogram(delivery_df, nbins=50):
+    values = delivery_df['delivery_diff'].dropna()
+    counts, edges = np.histogram(values, bins=bin_edges(values, nbins))
+    fig = go.Figure(binned_bar(counts, edges, marker_color='#00CC96'))
+    fig.add_vline(x=0, line_dash="dash", line_color="black", line_width=2)
+    fig.update_layout(
+        xaxis_title='Days (Positive = Early, Negative = Late)',
+        yaxis_title='count',
+        bargap=0,
+        height=400
+    )
+    return fig
+
+
+def delivery_status_pie(delivery_df):
+    on_time_dist = delivery_df['on_time'].value_counts()
+    fig = px.pie(
+        values=on_time_dist.values,
+        names=['On Time / Early', 'Late'],
+        color_discrete_sequence=['#00CC96', '#EF553B'],
+        hole=0.4
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=400)
+    return fig
+
+
+def distance_band_chart(band_summary):
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    fig.add_trace(
+        go.Bar(
+            x=band_summary['distance_band'].astype(str),
+            y=band_summary['avg_delivery_time'],
+            name="Avg Delivery Time (days)",
+            marker_color='skyblue',
+            customdata=band_summary[['orders']],
+            hovertemplate="%{y:.1f} days<br>%{customdata[0]:,} orders<extra></extra>"
+        ),
+        secondary_y=False
+    )
+
+    fig.add_trace(
+        go.Scatter(
+            x=band_summary['distance_band'].astype(str),
+            y=band_summary['on_time_rate'] * 100,
+            name="On-Time Rate (%)",
+            mode='lines+markers',
+            line=dict(color='red', width=3)
+        ),
+        secondary_y=True
+    )
+
+    fig.update_xaxes(title_text="Seller to Customer Distance")
+    fig.update_yaxes(title_text="Avg Delivery Time (days)", secondary_y=False)
+    fig.update_yaxes(title_text="On-Time Rate (%)", secondary_y=True)
+    fig.update_layout(height=400, hovermode='x unified')
+    return fig
+
+
+def route_lateness_bar(routes):
+    top_routes = routes.head(15)
+    fig = px.bar(
+        top_routes,
+        x='late_rate',
+        y='route',
+        orientation='h',
+        title="Routes with the Highest Late Delivery Rate",
+        labels={'late_rate': 'Late Rate', 'route': 'Route (Seller → Customer)'},
+        color='avg_distance_km',
+        color_continuous_scale='OrRd',
+        hover_data=['orders', 'avg_delivery_time']
+    )
+    fig.update_layout(height=500, xaxis_tickformat='.0%', yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+# RFM Segmentation
+def segment_pie(rfm_df):
+    segment_dist = rfm_df['segment'].value_counts()
+    fig = px.pie(
+        values=segment_dist.values,
+        names=segment_dist.index,
+        title="Customer Segment Distribution",
+        hole=0.4,
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=500)
+    return fig
+
+
+def segment_box(rfm_df, column, title):
+    # Quartiles and whiskers per segment are computed here, so the figure carries
+    # five numbers per box instead of every customer (outlier points are not drawn)
+    colors = px.colors.qualitative.Plotly
+    fig = go.Figure()
+    for i, (segment, values) in enumerate(rfm_df.groupby('segment', sort=False)[column]):
+        stats = box_stats(values)
+        fig.add_trace(go.Box(
+            x=[segment],
+            name=segment,
+            marker_color=colors[i % len(colors)],
+            **{key: [value] for key, value in stats.items()}
+        ))
+    fig.update_layout(title=title, xaxis_title='segment', yaxis_title=column, showlegend=False, height=400)
+    return fig
+
+
+def cluster_pie(rfm_df):
+    cluster_dist = rfm_df['cluster'].value_counts().sort_index()
+    cluster_names = [CLUSTER_LABELS.get(i, f'Cluster {i}') for i in cluster_dist.index]
+    fig = px.pie(
+        values=cluster_dist.values,
+        names=cluster_names,
+        title="Manual Cluster Distribution",
+        color_discrete_sequence=['gold', 'lightblue', 'lightcoral', 'lightgray']
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=400)
+    return fig
+
+
+def rfm_scatter_3d(rfm_df, budget=SCATTER_POINT_BUDGET):
+    # Collapse near-identical customers per cluster, then give every cluster
+    # (including the small VIP/Loyal ones) a guaranteed share of the budget.
+    # Within a cluster, voxels are sampled in proportion to the customers they
+    # stand for, and marker size grows with that count, so dense regions stay dense
+    points = voxel_thin(rfm_df, ['recency', 'frequency', 'monetary'], bins=48, by='cluster',
+                        log_columns=('frequency', 'monetary'))
+    points = stratified_sample(points, 'cluster', budget, min_per_group=250, weights='voxel_count')
+
+    points['cluster_name'] = points['cluster'].map(CLUSTER_LABELS)
+    points['marker_size'] = np.log1p(points['voxel_count'])
+
+    # scatter_3d renders with WebGL; small markers keep the payload light
+    fig = px.scatter_3d(
+        points,
+        x='recency',
+        y='frequency',
+        z='monetary',
+        color='cluster_name',
+        size='marker_size',
+        size_max=12,
+        hover_data={'recency': True, 'frequency': True, 'monetary': True, 'voxel_count': True,
+                    'marker_size': False},
+        title=f"3D RFM Scatter ({len(points):,} points for {len(rfm_df):,} customers)",
+        labels={'recency': 'Recency', 'frequency': 'Frequency', 'monetary': 'Monetary',
+                'voxel_count': 'Similar Customers'},
+        color_discrete_map=CLUSTER_COLORS
+    )
+    fig.update_traces(marker=dict(sizemin=2, opacity=0.8, line=dict(width=0)))
+    fig.update_layout(height=400)
+    return fig
+
+
+# Cross-Selling
+def product_pairs_bar(product_pairs):
+    # Top product pairs
+    top_pairs = product_pairs.nlargest(15, 'count')
+
+    # Create combination label
+    top_pairs['combination'] = top_pairs['category_1'] + ' + ' + top_pairs['category_2']
+
+    fig = px.bar(
+        top_pairs,
+        x='count',
+        y='combination',
+        orientation='h',
+        labels={'count': 'Times Bought Together', 'combination': 'Product Combination'},
+        color='count',
+        color_continuous_scale='Magma',
+        title="Top 15 Product Combinations"
+    )
+    fig.update_layout(height=600, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+# Chart name -> (builder, names of the datasets it is built from)
+STATIC_CHARTS = {
+    'overview_top_categories': (top_categories_bar, ['category_summary']),
+    'overview_category_revenue': (category_revenue_bar, ['category_summary']),
+    'overview_top_states': (top_states_subplots, ['state_summary']),
+    'overview_monthly_trend': (monthly_trend, ['monthly_sales']),
+    'sales_payment_methods': (payment_methods_pie, ['payment_summary']),
+    'geo_state_orders': (state_orders_bar, ['state_summary']),
+    'geo_state_revenue': (state_revenue_bar, ['state_summary']),
+    'geo_top_cities': (top_cities_treemap, ['city_summary']),
+    'customer_recency': (partial(rfm_histogram, column='recency', nbins=50,
+                                 label='Days Since Last Purchase', color='#636EFA'), ['rfm_df']),
+    'customer_frequency': (partial(rfm_histogram, column='frequency', nbins=20,
+                                   label='Number of Orders', color='#00CC96'), ['rfm_df']),
+    'customer_monetary': (partial(rfm_histogram, column='monetary', nbins=50,
+                                  label='Total Spending (R$)', color='#EF553B'), ['rfm_df']),
+    'customer_by_state': (customers_by_state_bar, ['state_summary']),
+    'customer_reviews': (review_scores_bar, ['review_summary']),
+    'delivery_time': (delivery_time_histogram, ['delivery_df']),
+    'delivery_diff': (delivery_diff_histogram, ['delivery_df']),
+    'delivery_status': (delivery_status_pie, ['delivery_df']),
+    'rfm_segments': (segment_pie, ['rfm_df']),
+    'rfm_segment_recency': (partial(segment_box, column='recency', title="Recency by Segment"), ['rfm_df']),
+    'rfm_segment_frequency': (partial(segment_box, column='frequency', title="Frequency by Segment"), ['rfm_df']),
+    'rfm_segment_monetary': (partial(segment_box, column='monetary', title="Monetary by Segment"), ['rfm_df']),
+    'rfm_clusters': (cluster_pie, ['rfm_df']),
+    'rfm_scatter_3d': (rfm_scatter_3d, ['rfm_df']),
+    'cross_selling_pairs': (product_pairs_bar, ['product_pairs']),
+}
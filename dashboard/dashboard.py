@@ -1,16 +1,25 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import folium
 from folium.plugins import HeatMap
 from streamlit_folium import folium_static
 import seaborn as sns
 import matplotlib.pyplot as plt
+import os
+import time
 from datetime import datetime
 
+from charts import (STATIC_CHARTS, binned_price_histogram, category_share_pie, distance_band_chart,
+                    rollup_trend, route_lateness_bar)
+from distance import distance_band_summary, order_distances, route_summary
+from downsampling import HEATMAP_POINT_BUDGET, grid_thin
+from drilldown import DrillDownIndex
+from figure_cache import FigureCache
+from result_cache import ResultCache, dataset_version, make_key
+from rollups import LEVELS, RollupStore
+from sketches import SketchStore, build_delivery_sketches, build_rfm_sketches
+
 # Page configuration
 st.set_page_config(
     page_title="Olist E-Commerce Dashboard",
@@ -38,7 +47,12 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Shared result cache settings (in-memory budget, optional spill directory)
+RESULT_CACHE_MAX_MB = int(os.environ.get('RESULT_CACHE_MAX_MB', 256))
+RESULT_CACHE_SPILL_DIR = os.environ.get('RESULT_CACHE_SPILL_DIR') or None
+
 # Load data
+@st.cache_resource(show_spinner="Loading datasets...")
 def load_data():
     """Load all necessary datasets"""
     try:
@@ -64,13 +78,100 @@ def load_data():
         # Convert datetime columns
         orders_df['order_purchase_timestamp'] = pd.to_datetime(orders_df['order_purchase_timestamp'])
         
-        return orders_df, rfm_df, monthly_sales, delivery_df, state_summary, city_summary, category_summary, payment_summary, customers_geo, product_pairs, review_summary
+        frames = orders_df, rfm_df, monthly_sales, delivery_df, state_summary, city_summary, category_summary, payment_summary, customers_geo, product_pairs, review_summary
+        # Fingerprinted once per load, not on every rerun
+        return (*frames, dataset_version(*frames))
     except FileNotFoundError as e:
         st.error(f"⚠️ Data files not found: {e}")
         st.stop()
 
+@st.cache_resource(show_spinner="Loading geolocation data...")
+def load_geo_data():
+    """Load zip-prefix coordinates and sellers for the distance engine (optional)"""
+    try:
+        geolocation = pd.read_csv('https://raw.githubusercontent.com/bills1912/brazil-ecommerce-project/refs/heads/main/dashboard/dashboard_data/geolocation_clean.csv')
+        sellers = pd.read_csv('https://raw.githubusercontent.com/bills1912/brazil-ecommerce-project/refs/heads/main/data/olist_sellers_dataset.csv')
+    except:
+        geolocation = None
+        sellers = None
+    # Distance results are cached (and spilled) per these inputs, not just the main datasets
+    return geolocation, sellers, dataset_version(geolocation, sellers)
+
+@st.cache_resource(max_entries=1)
+def get_result_cache(version):
+    """Result cache shared by all sessions (one per dataset version)"""
+    return ResultCache(
+        max_bytes=RESULT_CACHE_MAX_MB * 1024 ** 2,
+        spill_dir=RESULT_CACHE_SPILL_DIR,
+        version=version
+    )
+
+@st.cache_resource(show_spinner="Preparing charts...")
+def get_figure_cache(version, _datasets):
+    """Figure cache for one dataset version, pre-warmed with every static chart"""
+    cache = FigureCache(version)
+    cache.prewarm(STATIC_CHARTS, _datasets)
+    return cache
+
+def static_chart(name):
+    """Serve a static chart from the figure cache"""
+    builder, inputs = STATIC_CHARTS[name]
+    return figure_cache.get(name, lambda: builder(*[datasets[i] for i in inputs]))
+
+@st.cache_resource(show_spinner="Building time rollups...")
+def get_rollup_store(version, _orders_df):
+    """Day/week/month/quarter rollups for one dataset version"""
+    return RollupStore.build(_orders_df)
+
+@st.cache_resource(show_spinner="Loading statistics sketches...")
+def get_sketch_stores(version, _orders_df, _delivery_df, _rfm_df):
+    """Delivery (state x month x seller) and RFM (state x month) sketches for one dataset version"""
+    try:
+        # Exported by sketches.py together with the other dashboard data
+        return (SketchStore.load('https://raw.githubusercontent.com/bills1912/brazil-ecommerce-project/refs/heads/main/dashboard/dashboard_data', 'delivery_sketches'),
+                SketchStore.load('https://raw.githubusercontent.com/bills1912/brazil-ecommerce-project/refs/heads/main/dashboard/dashboard_data', 'rfm_sketches'))
+    except (OSError, ValueError, KeyError):
+        return build_delivery_sketches(_orders_df, _delivery_df), build_rfm_sketches(_orders_df, _rfm_df)
+
+@st.cache_resource(show_spinner="Indexing customers and orders...")
+def get_drilldown_index(version, _orders_df, _rfm_df, _delivery_df, _customers_geo):
+    """Customer -> orders -> items key index for one dataset version"""
+    return DrillDownIndex.build(_orders_df, _rfm_df, _delivery_df, _customers_geo)
+
+def sales_view(orders_df, date_range):
+    """Derived results for the Sales Analysis page over a date range"""
+    if len(date_range) == 2:
+        # The end date is inclusive (whole day), matching the rollup lookups
+        mask = (orders_df['order_purchase_timestamp'] >= pd.to_datetime(date_range[0])) & \
+               (orders_df['order_purchase_timestamp'] < pd.to_datetime(date_range[1]) + pd.Timedelta(days=1))
+        filtered_df = orders_df[mask]
+    else:
+        filtered_df = orders_df
+    
+    prices = filtered_df['price'].dropna().to_numpy()
+    price_counts, price_edges = np.histogram(prices, bins=50) if len(prices) else (np.array([]), np.array([0.0]))
+    
+    return {
+        'category_counts': filtered_df['product_category_name_english'].value_counts().head(10),
+        'price_counts': price_counts,
+        'price_edges': price_edges,
+        'price_median': float(np.median(prices)) if len(prices) else float('nan'),
+    }
+
 # Load data
-orders_df, rfm_df, monthly_sales, delivery_df, state_summary, city_summary, category_summary, payment_summary, customers_geo, product_pairs, review_summary = load_data()
+orders_df, rfm_df, monthly_sales, delivery_df, state_summary, city_summary, category_summary, payment_summary, customers_geo, product_pairs, review_summary, data_version = load_data()
+datasets = {
+    'orders_df': orders_df, 'rfm_df': rfm_df, 'monthly_sales': monthly_sales,
+    'delivery_df': delivery_df, 'state_summary': state_summary, 'city_summary': city_summary,
+    'category_summary': category_summary, 'payment_summary': payment_summary,
+    'customers_geo': customers_geo, 'product_pairs': product_pairs, 'review_summary': review_summary
+}
+result_cache = get_result_cache(data_version)
+figure_cache = get_figure_cache(data_version, datasets)
+rollup_store = get_rollup_store(data_version, orders_df)
+geolocation, sellers, geo_version = load_geo_data()
+delivery_sketches, rfm_sketches = get_sketch_stores(data_version, orders_df, delivery_df, rfm_df)
+drilldown = get_drilldown_index(data_version, orders_df, rfm_df, delivery_df, customers_geo)
 
 # Sidebar
 st.sidebar.image("https://img.icons8.com/color/96/000000/shopping-cart.png", width=100)
@@ -78,7 +179,7 @@ st.sidebar.title("🛒 Navigation")
 page = st.sidebar.radio(
     "Select Page",
     ["📊 Overview", "📈 Sales Analysis", "🗺️ Geographic Analysis", "👥 Customer Analysis", 
-     "🚚 Delivery Performance", "🎯 RFM Segmentation", "🔗 Cross-Selling"]
+     "🚚 Delivery Performance", "🎯 RFM Segmentation", "🔗 Cross-Selling", "🔍 Customer Lookup"]
 )
 
 st.sidebar.markdown("---")
@@ -94,6 +195,13 @@ st.sidebar.info(
     "**Data Period**: 2016-2018"
 )
 
+cache_stats = result_cache.stats()
+st.sidebar.caption(
+    f"Result cache: {cache_stats['entries']} entries, "
+    f"{cache_stats['bytes'] / 1024 ** 2:.1f} / {cache_stats['max_bytes'] / 1024 ** 2:.0f} MB, "
+    f"hit rate {cache_stats['hit_rate'] * 100:.0f}%"
+)
+
 # Main content
 if page == "📊 Overview":
     st.markdown('<div class="main-header">🛒 Olist E-Commerce Analytics Dashboard</div>', unsafe_allow_html=True)
@@ -125,91 +233,19 @@ if page == "📊 Overview":
     
     with col1:
         st.markdown("#### 📦 Top 10 Product Categories")
-        top_10 = category_summary.head(10)
-        fig = px.bar(
-            top_10,
-            x='total_orders',
-            y='category',
-            orientation='h',
-            labels={'total_orders': 'Number of Orders', 'category': 'Category'},
-            color='total_orders',
-            color_continuous_scale='Viridis'
-        )
-        fig.update_layout(showlegend=False, height=400, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('overview_top_categories'), use_container_width=True)
     
     with col2:
         st.markdown("#### 💰 Revenue by Category")
-        top_10_revenue = category_summary.nlargest(10, 'total_revenue')
-        fig = px.bar(
-            top_10_revenue,
-            x='total_revenue',
-            y='category',
-            orientation='h',
-            labels={'total_revenue': 'Revenue (R$)', 'category': 'Category'},
-            color='total_revenue',
-            color_continuous_scale='Reds'
-        )
-        fig.update_layout(showlegend=False, height=400, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('overview_category_revenue'), use_container_width=True)
     
     # Geographic overview
     st.markdown("#### 🗺️ Geographic Distribution - Top States")
-    top_states = state_summary.head(10)
-    
-    fig = make_subplots(
-        rows=1, cols=2,
-        subplot_titles=('Orders by State', 'Revenue by State'),
-        specs=[[{'type': 'bar'}, {'type': 'bar'}]]
-    )
-    
-    fig.add_trace(
-        go.Bar(x=top_states['state'], y=top_states['total_orders'], 
-               name='Orders', marker_color='skyblue'),
-        row=1, col=1
-    )
-    
-    fig.add_trace(
-        go.Bar(x=top_states['state'], y=top_states['total_revenue'], 
-               name='Revenue', marker_color='lightcoral'),
-        row=1, col=2
-    )
-    
-    fig.update_layout(height=400, showlegend=False)
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(static_chart('overview_top_states'), use_container_width=True)
     
     # Monthly trend
     st.markdown("#### 📅 Sales Trend Over Time")
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-    
-    fig.add_trace(
-        go.Scatter(
-            x=monthly_sales['year_month'],
-            y=monthly_sales['order_id'],
-            name="Orders",
-            mode='lines+markers',
-            line=dict(color='blue', width=3)
-        ),
-        secondary_y=False
-    )
-    
-    fig.add_trace(
-        go.Scatter(
-            x=monthly_sales['year_month'],
-            y=monthly_sales['payment_value'],
-            name="Revenue (R$)",
-            mode='lines+markers',
-            line=dict(color='red', width=3)
-        ),
-        secondary_y=True
-    )
-    
-    fig.update_xaxes(title_text="Month")
-    fig.update_yaxes(title_text="Number of Orders", secondary_y=False)
-    fig.update_yaxes(title_text="Revenue (R$)", secondary_y=True)
-    fig.update_layout(height=400, hovermode='x unified')
-    
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(static_chart('overview_monthly_trend'), use_container_width=True)
 
 elif page == "📈 Sales Analysis":
     st.markdown('<div class="main-header">📈 Sales Trend Analysis</div>', unsafe_allow_html=True)
@@ -226,68 +262,58 @@ elif page == "📈 Sales Analysis":
         max_value=date_max
     )
     
-    # Filter data
-    if len(date_range) == 2:
-        mask = (orders_df['order_purchase_timestamp'] >= pd.to_datetime(date_range[0])) & \
-               (orders_df['order_purchase_timestamp'] <= pd.to_datetime(date_range[1]))
-        filtered_df = orders_df[mask]
-    else:
-        filtered_df = orders_df
+    # Filtered results are shared across sessions through the result cache
+    view = result_cache.get_or_compute(
+        make_key(data_version, 'sales', date_range=date_range),
+        lambda: sales_view(orders_df, date_range)
+    )
+    bounds = tuple(date_range) if len(date_range) == 2 else (None, None)
     
-    # KPIs for filtered period
+    # KPIs for filtered period (from the day-level rollup prefix sums)
+    totals = rollup_store.totals(*bounds)
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Orders", f"{filtered_df['order_id'].nunique():,}")
+        st.metric("Orders", f"{int(totals['orders']):,}")
     with col2:
-        st.metric("Revenue", f"R$ {filtered_df['payment_value'].sum():,.2f}")
+        st.metric("Revenue", f"R$ {totals['revenue']:,.2f}")
     with col3:
-        st.metric("Avg Order Value", f"R$ {filtered_df['payment_value'].mean():,.2f}")
+        st.metric("Avg Order Value", f"R$ {totals['avg_order_value']:,.2f}")
     
     st.markdown("---")
     
+    # Sales trend with granularity switching
+    st.markdown("### 📅 Sales Trend")
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        granularity = st.selectbox("Granularity", list(LEVELS), index=2, format_func=str.title)
+    with col2:
+        trend_category = st.selectbox("Category", ['All Categories'] + rollup_store.members('category'))
+    
+    dim, member = (None, None) if trend_category == 'All Categories' else ('category', trend_category)
+    fig = figure_cache.get('sales_trend', lambda: rollup_trend(
+        rollup_store.series(granularity, *bounds, dim=dim, member=member), granularity
+    ), date_range=date_range, granularity=granularity, category=trend_category)
+    st.plotly_chart(fig, use_container_width=True)
+    
     # Category analysis
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("### 🏆 Best Performing Categories")
-        cat_dist = filtered_df['product_category_name_english'].value_counts().head(10)
-        fig = px.pie(
-            values=cat_dist.values,
-            names=cat_dist.index,
-            title="Top 10 Categories"
-        )
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-        fig.update_layout(height=500)
+        fig = figure_cache.get('sales_categories', lambda: category_share_pie(view['category_counts']),
+                               date_range=date_range)
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.markdown("### 💵 Price Distribution")
-        fig = px.histogram(
-            filtered_df,
-            x='price',
-            nbins=50,
-            title="Product Price Distribution",
-            labels={'price': 'Price (R$)', 'count': 'Frequency'}
-        )
-        fig.add_vline(
-            x=filtered_df['price'].median(),
-            line_dash="dash",
-            line_color="red",
-            annotation_text=f"Median: R$ {filtered_df['price'].median():.2f}"
-        )
-        fig.update_layout(height=500)
+        fig = figure_cache.get('sales_prices', lambda: binned_price_histogram(
+            view['price_counts'], view['price_edges'], view['price_median']
+        ), date_range=date_range)
         st.plotly_chart(fig, use_container_width=True)
     
     # Payment methods
     st.markdown("### 💳 Payment Methods")
-    fig = px.pie(
-        payment_summary,
-        values='total_orders',
-        names='payment_type',
-        title="Payment Type Distribution"
-    )
-    fig.update_traces(textposition='inside', textinfo='percent+label')
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(static_chart('sales_payment_methods'), use_container_width=True)
 
 elif page == "🗺️ Geographic Analysis":
     st.markdown('<div class="main-header">🗺️ Geographic Distribution Analysis</div>', unsafe_allow_html=True)
@@ -312,50 +338,15 @@ elif page == "🗺️ Geographic Analysis":
     
     with col1:
         # Top 15 states by orders
-        top_15_states = state_summary.head(15)
-        fig = px.bar(
-            top_15_states,
-            x='total_orders',
-            y='state',
-            orientation='h',
-            title="Top 15 States by Orders",
-            labels={'total_orders': 'Number of Orders', 'state': 'State'},
-            color='total_orders',
-            color_continuous_scale='Blues'
-        )
-        fig.update_layout(height=600, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('geo_state_orders'), use_container_width=True)
     
     with col2:
         # Top 15 states by revenue
-        top_15_revenue = state_summary.nlargest(15, 'total_revenue')
-        fig = px.bar(
-            top_15_revenue,
-            x='total_revenue',
-            y='state',
-            orientation='h',
-            title="Top 15 States by Revenue",
-            labels={'total_revenue': 'Revenue (R$)', 'state': 'State'},
-            color='total_revenue',
-            color_continuous_scale='Reds'
-        )
-        fig.update_layout(height=600, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('geo_state_revenue'), use_container_width=True)
     
     # City analysis
     st.markdown("### 🏙️ Top Cities")
-    top_20_cities = city_summary.head(20)
-    
-    fig = px.treemap(
-        top_20_cities,
-        path=['state', 'city'],
-        values='total_orders',
-        color='total_revenue',
-        title="Top 20 Cities - Orders & Revenue",
-        color_continuous_scale='Viridis'
-    )
-    fig.update_layout(height=600)
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(static_chart('geo_top_cities'), use_container_width=True)
     
     # Heatmap
     if customers_geo is not None and not customers_geo.empty:
@@ -363,9 +354,17 @@ elif page == "🗺️ Geographic Analysis":
         
         st.info("💡 This map shows the geographic distribution of customers across Brazil. Darker/denser areas indicate higher customer concentration.")
         
-        # Sample data for performance (max 5000 points)
-        sample_size = min(5000, len(customers_geo))
-        geo_sample = customers_geo.dropna(subset=['geolocation_lat', 'geolocation_lng']).sample(n=sample_size, random_state=42)
+        # Thin to a weighted grid instead of a uniform sample: every populated area
+        # keeps a point, weighted by the customers it represents
+        geo_points = result_cache.get_or_compute(
+            make_key(data_version, 'heatmap', budget=HEATMAP_POINT_BUDGET),
+            lambda: grid_thin(
+                customers_geo.dropna(subset=['geolocation_lat', 'geolocation_lng']),
+                ['geolocation_lat', 'geolocation_lng'],
+                budget=HEATMAP_POINT_BUDGET,
+                bins=64
+            )
+        )
         
         # Create folium map
         m = folium.Map(
@@ -374,9 +373,9 @@ elif page == "🗺️ Geographic Analysis":
             tiles='OpenStreetMap'
         )
         
-        # Prepare heatmap data
-        heat_data = [[row['geolocation_lat'], row['geolocation_lng']] 
-                     for idx, row in geo_sample.iterrows()]
+        # Prepare heatmap data (log-scaled weights so Sao Paulo does not wash out the rest)
+        weights = np.log1p(geo_points['voxel_count']) / np.log1p(geo_points['voxel_count'].max())
+        heat_data = np.column_stack([geo_points['geolocation_lat'], geo_points['geolocation_lng'], weights]).tolist()
         
         # Add heatmap
         HeatMap(heat_data, radius=15, blur=25, max_zoom=13).add_to(m)
@@ -384,7 +383,7 @@ elif page == "🗺️ Geographic Analysis":
         # Display map
         folium_static(m, width=1200, height=600)
         
-        st.caption(f"Showing {sample_size:,} customer locations (sampled from total)")
+        st.caption(f"Showing {len(geo_points):,} grid points covering {int(geo_points['voxel_count'].sum()):,} customer locations")
     else:
         st.warning("Geographic coordinate data not available for heatmap visualization.")
 
@@ -414,81 +413,24 @@ elif page == "👥 Customer Analysis":
     
     with col1:
         st.markdown("### 📊 Recency Distribution")
-        fig = px.histogram(
-            rfm_df,
-            x='recency',
-            nbins=50,
-            labels={'recency': 'Days Since Last Purchase'},
-            color_discrete_sequence=['#636EFA']
-        )
-        fig.add_vline(
-            x=rfm_df['recency'].median(),
-            line_dash="dash",
-            line_color="red"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('customer_recency'), use_container_width=True)
     
     with col2:
         st.markdown("### 🔄 Frequency Distribution")
-        fig = px.histogram(
-            rfm_df,
-            x='frequency',
-            nbins=20,
-            labels={'frequency': 'Number of Orders'},
-            color_discrete_sequence=['#00CC96']
-        )
-        fig.add_vline(
-            x=rfm_df['frequency'].median(),
-            line_dash="dash",
-            line_color="red"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('customer_frequency'), use_container_width=True)
     
     with col3:
         st.markdown("### 💰 Monetary Distribution")
-        fig = px.histogram(
-            rfm_df,
-            x='monetary',
-            nbins=50,
-            labels={'monetary': 'Total Spending (R$)'},
-            color_discrete_sequence=['#EF553B']
-        )
-        fig.add_vline(
-            x=rfm_df['monetary'].median(),
-            line_dash="dash",
-            line_color="red"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('customer_monetary'), use_container_width=True)
     
     # Customer by state
     st.markdown("### 🗺️ Customer Distribution by State")
-    customer_by_state = state_summary.nlargest(15, 'total_customers')
-    
-    fig = px.bar(
-        customer_by_state,
-        x='total_customers',
-        y='state',
-        orientation='h',
-        labels={'total_customers': 'Number of Customers', 'state': 'State'},
-        color='total_customers',
-        color_continuous_scale='Greens'
-    )
-    fig.update_layout(height=500, showlegend=False, yaxis={'categoryorder': 'total ascending'})
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(static_chart('customer_by_state'), use_container_width=True)
     
     # Review distribution
     if review_summary is not None:
         st.markdown("### ⭐ Customer Review Scores")
-        fig = px.bar(
-            review_summary,
-            x='review_score',
-            y='count',
-            labels={'review_score': 'Review Score', 'count': 'Number of Reviews'},
-            color='review_score',
-            color_continuous_scale='RdYlGn'
-        )
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('customer_reviews'), use_container_width=True)
         
         avg_score = (review_summary['review_score'] * review_summary['count']).sum() / review_summary['count'].sum()
         st.info(f"📊 Average Review Score: {avg_score:.2f} / 5.0")
@@ -522,55 +464,18 @@ elif page == "🚚 Delivery Performance":
     
     with col1:
         st.markdown("### 📦 Actual vs Estimated Delivery Time")
-        fig = go.Figure()
-        fig.add_trace(go.Histogram(
-            x=delivery_df['actual_delivery_time'],
-            name='Actual Delivery Time',
-            opacity=0.7,
-            marker_color='blue'
-        ))
-        fig.add_trace(go.Histogram(
-            x=delivery_df['estimated_delivery_time'],
-            name='Estimated Delivery Time',
-            opacity=0.7,
-            marker_color='red'
-        ))
-        fig.update_layout(
-            barmode='overlay',
-            xaxis_title='Days',
-            yaxis_title='Frequency',
-            height=400
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('delivery_time'), use_container_width=True)
     
     with col2:
         st.markdown("### ⏱️ Delivery Time Difference")
-        fig = px.histogram(
-            delivery_df,
-            x='delivery_diff',
-            nbins=50,
-            labels={'delivery_diff': 'Days (Positive = Early, Negative = Late)'},
-            color_discrete_sequence=['#00CC96']
-        )
-        fig.add_vline(x=0, line_dash="dash", line_color="black", line_width=2)
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('delivery_diff'), use_container_width=True)
     
     # On-time delivery pie chart
     st.markdown("### ✅ Delivery Status Distribution")
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        on_time_dist = delivery_df['on_time'].value_counts()
-        fig = px.pie(
-            values=on_time_dist.values,
-            names=['On Time / Early', 'Late'],
-            color_discrete_sequence=['#00CC96', '#EF553B'],
-            hole=0.4
-        )
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('delivery_status'), use_container_width=True)
     
     with col2:
         st.markdown("#### 📈 Performance Metrics")
@@ -589,6 +494,71 @@ elif page == "🚚 Delivery Performance":
             grade = "❌ Needs Improvement"
         
         st.metric("Performance Grade", grade)
+    
+    # Lateness vs distance
+    if geolocation is not None and 'customer_zip_code_prefix' in orders_df.columns:
+        st.markdown("### 📏 Delivery Performance by Distance")
+        
+        distances = result_cache.get_or_compute(
+            make_key(data_version, 'delivery_distance', geo=geo_version),
+            lambda: order_distances(orders_df, geolocation, sellers)
+        )
+        band_summary = result_cache.get_or_compute(
+            make_key(data_version, 'delivery_distance_bands', geo=geo_version),
+            lambda: distance_band_summary(distances, delivery_df)
+        )
+        routes = result_cache.get_or_compute(
+            make_key(data_version, 'delivery_routes', geo=geo_version),
+            lambda: route_summary(distances, delivery_df)
+        )
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            fig = figure_cache.get('delivery_distance_bands', lambda: distance_band_chart(band_summary), geo=geo_version)
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            fig = figure_cache.get('delivery_routes', lambda: route_lateness_bar(routes), geo=geo_version)
+            st.plotly_chart(fig, use_container_width=True)
+        
+        st.caption(f"Median seller to customer distance: {distances['distance_km'].median():,.0f} km "
+                   f"over {len(distances):,} geocoded orders (routes with at least 30 orders)")
+
+    # Delivery SLA for any slice, answered by merging per-cell sketches
+    st.markdown("### 🎯 Delivery SLA by Slice")
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        sla_state = st.selectbox("Customer State", ['All States'] + delivery_sketches.values('state'), key='sla_state')
+    with col2:
+        months = delivery_sketches.values('month')
+        sla_months = st.select_slider("Purchase Month", options=months, value=(months[0], months[-1]), key='sla_months')
+    with col3:
+        sla_seller = st.text_input("Seller ID (optional)", key='sla_seller').strip()
+    
+    slice_filters = {
+        'state': None if sla_state == 'All States' else sla_state,
+        'month': [m for m in months if sla_months[0] <= m <= sla_months[1]],
+        'seller': sla_seller or None,
+    }
+    actual = delivery_sketches.summary('actual_delivery_time', **slice_filters)
+    estimated = delivery_sketches.summary('estimated_delivery_time', **slice_filters)
+    
+    if actual['count']:
+        col1, col2, col3, col4, col5 = st.columns(5)
+        col1.metric("Orders", f"{int(actual['count']):,}")
+        # Whole-day metrics get whole-day percentiles
+        days = '.0f' if 'actual_delivery_time' in delivery_sketches.discrete else '.1f'
+        col2.metric("P50 Delivery", f"{actual['p50']:{days}} days")
+        col3.metric("P90 Delivery", f"{actual['p90']:{days}} days")
+        col4.metric("P99 Delivery", f"{actual['p99']:{days}} days")
+        col5.metric("Mean ± Std", f"{actual['mean']:.1f} ± {actual['std']:.1f}")
+        days = '.0f' if 'estimated_delivery_time' in delivery_sketches.discrete else '.1f'
+        st.caption(f"Estimated delivery time in this slice: P50 {estimated['p50']:{days}} days, "
+                   f"P90 {estimated['p90']:{days}} days (percentiles are t-digest estimates)")
+    else:
+        st.warning("No delivered orders in this slice.")
 
 elif page == "🎯 RFM Segmentation":
     st.markdown('<div class="main-header">🎯 RFM Customer Segmentation</div>', unsafe_allow_html=True)
@@ -601,20 +571,30 @@ elif page == "🎯 RFM Segmentation":
     - **Monetary**: How much money they spend
     """)
     
-    # RFM Metrics overview
+    # RFM Metrics overview (exact over all customers, per state x month sketches for a state)
+    rfm_state = st.selectbox("Customer State", ['All States'] + rfm_sketches.values('state'), key='rfm_state')
+    if rfm_state == 'All States':
+        recency, frequency, monetary = (
+            {'mean': rfm_df[col].mean(), 'p50': rfm_df[col].median()} for col in ['recency', 'frequency', 'monetary']
+        )
+    else:
+        recency = rfm_sketches.summary('recency', quantiles=(0.5,), state=rfm_state)
+        frequency = rfm_sketches.summary('frequency', quantiles=(0.5,), state=rfm_state)
+        monetary = rfm_sketches.summary('monetary', quantiles=(0.5,), state=rfm_state)
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
         st.markdown("#### 🕐 Recency")
-        st.info(f"**Average**: {rfm_df['recency'].mean():.1f} days\n\n**Median**: {rfm_df['recency'].median():.0f} days")
+        st.info(f"**Average**: {recency['mean']:.1f} days\n\n**Median**: {recency['p50']:.0f} days")
     
     with col2:
         st.markdown("#### 🔄 Frequency")
-        st.info(f"**Average**: {rfm_df['frequency'].mean():.2f} orders\n\n**Median**: {rfm_df['frequency'].median():.0f} orders")
+        st.info(f"**Average**: {frequency['mean']:.2f} orders\n\n**Median**: {frequency['p50']:.0f} orders")
     
     with col3:
         st.markdown("#### 💰 Monetary")
-        st.info(f"**Average**: R$ {rfm_df['monetary'].mean():.2f}\n\n**Median**: R$ {rfm_df['monetary'].median():.2f}")
+        st.info(f"**Average**: R$ {monetary['mean']:.2f}\n\n**Median**: R$ {monetary['p50']:.2f}")
     
     st.markdown("---")
     
@@ -627,16 +607,7 @@ elif page == "🎯 RFM Segmentation":
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            fig = px.pie(
-                values=segment_dist.values,
-                names=segment_dist.index,
-                title="Customer Segment Distribution",
-                hole=0.4,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(height=500)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(static_chart('rfm_segments'), use_container_width=True)
         
         with col2:
             st.markdown("#### Segment Details")
@@ -665,76 +636,25 @@ elif page == "🎯 RFM Segmentation":
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            fig = px.box(rfm_df, x='segment', y='recency', color='segment',
-                        title="Recency by Segment")
-            fig.update_layout(showlegend=False, height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(static_chart('rfm_segment_recency'), use_container_width=True)
         
         with col2:
-            fig = px.box(rfm_df, x='segment', y='frequency', color='segment',
-                        title="Frequency by Segment")
-            fig.update_layout(showlegend=False, height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(static_chart('rfm_segment_frequency'), use_container_width=True)
         
         with col3:
-            fig = px.box(rfm_df, x='segment', y='monetary', color='segment',
-                        title="Monetary by Segment")
-            fig.update_layout(showlegend=False, height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(static_chart('rfm_segment_monetary'), use_container_width=True)
     
     # Manual Clusters (if available)
     if 'cluster' in rfm_df.columns:
         st.markdown("### 🔍 Manual Customer Clusters")
         
-        cluster_labels = {
-            0: 'VIP Customers',
-            1: 'Loyal Customers',
-            2: 'At Risk',
-            3: 'Low Value'
-        }
-        
-        cluster_dist = rfm_df['cluster'].value_counts().sort_index()
-        
         col1, col2 = st.columns(2)
         
         with col1:
-            cluster_names = [cluster_labels.get(i, f'Cluster {i}') for i in cluster_dist.index]
-            fig = px.pie(
-                values=cluster_dist.values,
-                names=cluster_names,
-                title="Manual Cluster Distribution",
-                color_discrete_sequence=['gold', 'lightblue', 'lightcoral', 'lightgray']
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(static_chart('rfm_clusters'), use_container_width=True)
         
         with col2:
-            # 3D scatter sample
-            sample_size = min(2000, len(rfm_df))
-            rfm_sample = rfm_df.sample(n=sample_size, random_state=42)
-            
-            rfm_sample['cluster_name'] = rfm_sample['cluster'].map(cluster_labels)
-            
-            fig = px.scatter_3d(
-                rfm_sample,
-                x='recency',
-                y='frequency',
-                z='monetary',
-                color='cluster_name',
-                size='monetary',
-                hover_data=['recency', 'frequency', 'monetary'],
-                title=f"3D RFM Scatter (Sample: {sample_size})",
-                labels={'recency': 'Recency', 'frequency': 'Frequency', 'monetary': 'Monetary'},
-                color_discrete_map={
-                    'VIP Customers': 'gold',
-                    'Loyal Customers': 'lightblue',
-                    'At Risk': 'lightcoral',
-                    'Low Value': 'lightgray'
-                }
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(static_chart('rfm_scatter_3d'), use_container_width=True)
     
     # Recommendations
     st.markdown("### 💡 Strategic Recommendations")
@@ -783,24 +703,7 @@ elif page == "🔗 Cross-Selling":
         
         st.info("💡 These product combinations are frequently purchased together in the same order. Use this insight for product bundling, recommendations, and targeted marketing.")
         
-        # Top product pairs
-        top_pairs = product_pairs.nlargest(15, 'count')
-        
-        # Create combination label
-        top_pairs['combination'] = top_pairs['category_1'] + ' + ' + top_pairs['category_2']
-        
-        fig = px.bar(
-            top_pairs,
-            x='count',
-            y='combination',
-            orientation='h',
-            labels={'count': 'Times Bought Together', 'combination': 'Product Combination'},
-            color='count',
-            color_continuous_scale='Magma',
-            title="Top 15 Product Combinations"
-        )
-        fig.update_layout(height=600, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(static_chart('cross_selling_pairs'), use_container_width=True)
         
         # Show data table
         st.markdown("### 📋 Product Pair Details")
@@ -871,6 +774,80 @@ elif page == "🔗 Cross-Selling":
         st.warning("Product pair data not available. Please run the analysis script to generate cross-selling insights.")
         st.info("Run: `python analisis_data_olist.py` to generate the data.")
 
+elif page == "🔍 Customer Lookup":
+    st.markdown('<div class="main-header">🔍 Customer & Order Lookup</div>', unsafe_allow_html=True)
+    
+    query = st.text_input("Search by customer_unique_id or order_id", key='lookup_query').strip()
+    
+    # Indexed lookup: one hash probe plus CSR offset slices, no frame scans
+    started = time.perf_counter()
+    match = drilldown.search(query) if query else None
+    elapsed_us = (time.perf_counter() - started) * 1e6
+    
+    if not query:
+        stats = drilldown.stats()
+        st.info(f"Enter a customer or order ID to see the RFM profile, orders, delivery outcomes and location. "
+                f"Indexed {stats['customers']:,} customers, {stats['orders']:,} orders and {stats['items']:,} items.")
+    elif match is None:
+        st.warning(f"No customer or order found for `{query}`.")
+    else:
+        kind, result = match
+        st.caption(f"Found {kind} in {elapsed_us:,.0f} µs")
+        
+        if kind == 'order':
+            order = result['order']
+            st.markdown(f"### 📦 Order {order['order_id']}")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Purchased", f"{pd.Timestamp(order['order_purchase_timestamp']):%Y-%m-%d}")
+            with col2:
+                st.metric("Items", f"{int(order['items'])}")
+            with col3:
+                # Payment total, like the Avg Order Value KPI and RFM monetary
+                st.metric("Order Value", f"R$ {order.get('payment_value', np.nan):,.2f}",
+                          help=f"Items + freight: R$ {order.get('order_value', np.nan):,.2f}")
+            with col4:
+                if pd.notna(order.get('actual_delivery_time', np.nan)):
+                    status = "On Time" if order.get('on_time') else "Late"
+                    st.metric("Delivery", f"{order['actual_delivery_time']:.0f} days", status,
+                              delta_color="normal" if order.get('on_time') else "inverse")
+                else:
+                    st.metric("Delivery", "Not delivered")
+            
+            st.markdown("#### 🧾 Items")
+            st.dataframe(pd.DataFrame(result['items']), use_container_width=True)
+            result = drilldown.customer(order['customer_unique_id'])
+        
+        st.markdown(f"### 👤 Customer {result['customer_unique_id']}")
+        rfm = result['rfm']
+        if rfm is not None:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Recency", f"{rfm.get('recency', np.nan):.0f} days")
+            with col2:
+                st.metric("Frequency", f"{rfm.get('frequency', np.nan):.0f} orders")
+            with col3:
+                st.metric("Monetary", f"R$ {rfm.get('monetary', np.nan):,.2f}")
+            with col4:
+                st.metric("Segment", rfm.get('segment') or "-")
+        else:
+            st.warning("No RFM record for this customer.")
+        
+        location = result['location']
+        if location is not None:
+            st.markdown(f"**📍 Location**: {location.get('customer_city', '-')}, {location.get('customer_state', '-')}")
+            if pd.notna(location.get('geolocation_lat', np.nan)):
+                st.map(pd.DataFrame({'lat': [location['geolocation_lat']], 'lon': [location['geolocation_lng']]}),
+                       zoom=8)
+        
+        customer_orders = pd.DataFrame(result['orders']).drop(columns='customer_unique_id')
+        st.markdown(f"#### 📦 Orders ({len(customer_orders)})")
+        if 'on_time' in customer_orders:
+            delivered = customer_orders['on_time'].notna()
+            st.caption(f"{int(customer_orders.loc[delivered, 'on_time'].astype(bool).sum())} of "
+                       f"{int(delivered.sum())} delivered orders arrived on time")
+        st.dataframe(customer_orders, use_container_width=True)
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,124 @@
+"""
+Seller to customer distance engine for delivery analytics.
+
+Seller and customer zip prefixes are geocoded through the cleaned
+geolocation table (one coordinate per zip prefix) with index lookups, and
+great-circle distances are computed with vectorized haversine. Order items
+are resolved, geocoded and measured in fixed-size batches, so the
+intermediate coordinate arrays stay bounded by the batch size. Per-order
+results keep the farthest item, since an order is delivered when its last
+item arrives.
+"""
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+
+DISTANCE_BANDS = [0, 100, 300, 600, 1000, 1500, 2000, 3000, np.inf]
+DISTANCE_BAND_LABELS = ['< 100 km', '100-300 km', '300-600 km', '600-1000 km',
+                        '1000-1500 km', '1500-2000 km', '2000-3000 km', '> 3000 km']
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km between arrays of coordinates (degrees)"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _zip_lookup(geolocation):
+    """Zip prefix index plus aligned lat/lng arrays (one coordinate per prefix)"""
+    geo = geolocation.drop_duplicates('geolocation_zip_code_prefix')
+    index = pd.Index(geo['geolocation_zip_code_prefix'].astype('int64'))
+    return index, geo['geolocation_lat'].to_numpy(), geo['geolocation_lng'].to_numpy()
+
+
+def geocode(zip_prefixes, geolocation, lookup=None):
+    """Look up (lat, lng) arrays for zip prefixes; unknown prefixes give NaN.
+
+    Pass a prebuilt _zip_lookup() as `lookup` to geocode many batches.
+    """
+    index, geo_lat, geo_lng = lookup if lookup is not None else _zip_lookup(geolocation)
+    zips = pd.to_numeric(pd.Series(zip_prefixes), errors='coerce')
+    positions = index.get_indexer(zips.fillna(-1).astype('int64'))
+    found = positions >= 0
+
+    lat = np.full(len(zips), np.nan)
+    lng = np.full(len(zips), np.nan)
+    lat[found] = geo_lat[positions[found]]
+    lng[found] = geo_lng[positions[found]]
+    return lat, lng
+
+
+def item_distances(orders_df, geolocation, sellers=None, batch_size=200_000):
+    """Seller-customer distance for every order item.
+
+    Seller zip prefixes come from the sellers dataset when given (falling back
+    to the merged seller_zip_code_prefix column). Items are resolved and
+    geocoded batch_size rows at a time, so the coordinate arrays never exceed
+    one batch. Returns order_id, seller_state, customer_state and distance_km
+    per item.
+    """
+    lookup = _zip_lookup(geolocation)
+    by_id = sellers.drop_duplicates('seller_id').set_index('seller_id') if sellers is not None else None
+
+    distance = np.empty(len(orders_df))
+    seller_states = np.empty(len(orders_df), dtype=object)
+    for start in range(0, len(orders_df), batch_size):
+        batch = orders_df.iloc[start:start + batch_size]
+        missing = pd.Series(np.nan, index=batch.index)
+        seller_zip = batch['seller_zip_code_prefix'] if 'seller_zip_code_prefix' in batch else missing
+        seller_state = batch['seller_state'] if 'seller_state' in batch else missing
+        if by_id is not None:
+            seller_zip = batch['seller_id'].map(by_id['seller_zip_code_prefix']).fillna(seller_zip)
+            seller_state = batch['seller_id'].map(by_id['seller_state']).fillna(seller_state)
+
+        seller_lat, seller_lng = geocode(seller_zip, geolocation, lookup)
+        customer_lat, customer_lng = geocode(batch['customer_zip_code_prefix'], geolocation, lookup)
+        distance[start:start + len(batch)] = haversine_km(seller_lat, seller_lng, customer_lat, customer_lng)
+        seller_states[start:start + len(batch)] = seller_state.to_numpy(dtype=object)
+
+    return pd.DataFrame({
+        'order_id': orders_df['order_id'].to_numpy(),
+        'seller_state': seller_states,
+        'customer_state': orders_df['customer_state'].to_numpy(),
+        'distance_km': distance,
+    })
+
+
+def order_distances(orders_df, geolocation, sellers=None):
+    """Per-order distance (farthest item) with its seller -> customer state route"""
+    items = item_distances(orders_df, geolocation, sellers).dropna(subset=['distance_km'])
+    # Keep the farthest item of each order: sort once, then first row per order
+    farthest = items.sort_values('distance_km', ascending=False).drop_duplicates('order_id')
+    result = farthest.assign(route=farthest['seller_state'] + ' → ' + farthest['customer_state'])
+    result['distance_band'] = pd.cut(result['distance_km'], DISTANCE_BANDS,
+                                     labels=DISTANCE_BAND_LABELS, right=False)
+    return result.sort_values('order_id').reset_index(drop=True)
+
+
+def _delivery_agg(frame, keys):
+    return frame.groupby(keys, observed=True).agg(
+        orders=('order_id', 'size'),
+        avg_distance_km=('distance_km', 'mean'),
+        avg_delivery_time=('actual_delivery_time', 'mean'),
+        median_delivery_time=('actual_delivery_time', 'median'),
+        on_time_rate=('on_time', 'mean'),
+    ).reset_index()
+
+
+def distance_band_summary(order_dist, delivery_df):
+    """Delivery time and on-time rate per distance band"""
+    merged = order_dist.merge(delivery_df, on='order_id', how='inner')
+    merged['on_time'] = merged['on_time'].astype(float)
+    return _delivery_agg(merged, 'distance_band')
+
+
+def route_summary(order_dist, delivery_df, min_orders=30):
+    """Delivery time and on-time rate per seller state -> customer state route"""
+    merged = order_dist.merge(delivery_df, on='order_id', how='inner')
+    merged['on_time'] = merged['on_time'].astype(float)
+    routes = _delivery_agg(merged, 'route')
+    routes['late_rate'] = 1 - routes['on_time_rate']
+    return routes[routes['orders'] >= min_orders].sort_values('late_rate', ascending=False)
@@ -0,0 +1,203 @@
+"""
+Point-budget down-sampling for large charts.
+
+- stratified_sample: per-group reservoir sampling, so rare groups (e.g. the
+  VIP and Loyal clusters) keep a guaranteed share of the point budget
+- voxel_thin: grid thinning for 2D/3D point clouds; one representative per
+  occupied cell plus the number of rows it stands for; grid_thin picks the
+  finest grid that fits a point budget
+- lttb: Largest-Triangle-Three-Buckets reduction for time series
+- bin_edges / box_stats: pre-aggregated histograms and box plots, so only
+  bars and quartiles are sent to the browser instead of every row
+
+Budgets can be overridden with environment variables.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+SCATTER_POINT_BUDGET = int(os.environ.get('SCATTER_POINT_BUDGET', 2000))
+HEATMAP_POINT_BUDGET = int(os.environ.get('HEATMAP_POINT_BUDGET', 5000))
+TREND_POINT_BUDGET = int(os.environ.get('TREND_POINT_BUDGET', 500))
+# Above this many points per trace, charts switch to WebGL (Scattergl)
+WEBGL_THRESHOLD = int(os.environ.get('WEBGL_THRESHOLD', 1000))
+
+
+def allocate_budget(group_sizes, budget, min_per_group=100):
+    """Split a point budget across groups.
+
+    Every group first gets min(size, min_per_group) points, the rest of the
+    budget is shared in proportion to group size. Returns a Series aligned
+    with group_sizes.
+    """
+    sizes = pd.Series(group_sizes).astype(int)
+    if sizes.sum() <= budget:
+        return sizes.copy()
+
+    alloc = np.minimum(sizes, min_per_group)
+    if alloc.sum() > budget:
+        # Too many groups for the floor: share the budget evenly instead
+        alloc = np.minimum(sizes, budget // max(len(sizes), 1))
+    remaining = budget - alloc.sum()
+    spare = sizes - alloc
+    if remaining > 0 and spare.sum() > 0:
+        extra = np.floor(spare / spare.sum() * remaining).astype(int)
+        alloc = alloc + np.minimum(extra, spare)
+    return alloc.astype(int)
+
+
+def stratified_sample(df, by, budget, min_per_group=100, random_state=42, weights=None):
+    """Sample at most budget rows, keeping every group of column `by` represented.
+
+    Each group is reservoir-sampled: rows get a uniform random key and the k
+    smallest keys per group are kept, which gives the same distribution as
+    Algorithm R in a single vectorized pass. With `weights` (a column name,
+    e.g. voxel_count) rows get exponential keys divided by their weight
+    (Efraimidis-Spirakis), so heavier rows are proportionally more likely to
+    be kept.
+    """
+    if len(df) <= budget:
+        return df
+
+    rng = np.random.default_rng(random_state)
+    codes, uniques = pd.factorize(df[by], sort=True)
+    sizes = pd.Series(np.bincount(codes[codes >= 0], minlength=len(uniques)))
+    alloc = allocate_budget(sizes, budget, min_per_group).to_numpy()
+
+    if weights is None:
+        keys = rng.random(len(df))
+    else:
+        w = np.clip(df[weights].to_numpy(dtype=float), 1e-12, None)
+        keys = rng.exponential(size=len(df)) / w
+    order = np.lexsort((keys, codes))
+    sorted_codes = codes[order]
+    # Rank of each row inside its group after ordering by random key
+    group_start = np.searchsorted(sorted_codes, sorted_codes, side='left')
+    rank = np.arange(len(order)) - group_start
+    valid = sorted_codes >= 0
+    keep = np.zeros(len(order), dtype=bool)
+    keep[valid] = rank[valid] < alloc[sorted_codes[valid]]
+    return df.iloc[np.sort(order[keep])]
+
+
+def voxel_thin(df, columns, bins=32, by=None, log_columns=()):
+    """Keep one row per occupied grid cell over `columns`.
+
+    Columns are scaled to [0, 1] (log1p first for log_columns) and cut into
+    `bins` cells each. When `by` is given, groups never share a cell. The
+    returned frame has a `voxel_count` column with the rows each point stands
+    for.
+    """
+    if df.empty:
+        return df.assign(voxel_count=pd.Series(dtype=int))
+
+    cell = np.zeros(len(df), dtype=np.int64)
+    for col in columns:
+        values = df[col].to_numpy(dtype=float)
+        if col in log_columns:
+            values = np.log1p(np.clip(values, 0, None))
+        lo, hi = np.nanmin(values), np.nanmax(values)
+        span = hi - lo if hi > lo else 1.0
+        idx = np.clip(((values - lo) / span * bins).astype(np.int64), 0, bins - 1)
+        cell = cell * bins + idx
+    if by is not None:
+        group_codes, _ = pd.factorize(df[by])
+        cell = cell + group_codes.astype(np.int64) * bins ** len(columns)
+
+    _, first_rows, counts = np.unique(cell, return_index=True, return_counts=True)
+    thinned = df.iloc[first_rows].copy()
+    thinned['voxel_count'] = counts
+    return thinned
+
+
+def grid_thin(df, columns, budget, bins=32, by=None, log_columns=()):
+    """Voxel-thin to the point budget, refining the grid while there is room.
+
+    Starts from `bins` cells per axis and doubles the resolution while the
+    result still fits in the budget; if even the coarsest grid is too large,
+    the heaviest cells are kept.
+    """
+    thinned = voxel_thin(df, columns, bins=bins, by=by, log_columns=log_columns)
+    while len(thinned) < budget and bins < 1024 and len(thinned) < len(df):
+        finer = voxel_thin(df, columns, bins=bins * 2, by=by, log_columns=log_columns)
+        if len(finer) > budget:
+            break
+        thinned, bins = finer, bins * 2
+    if len(thinned) > budget:
+        thinned = thinned.nlargest(budget, 'voxel_count')
+    return thinned
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets down-sampling.
+
+    x must be numeric and sorted (use positions for categorical axes).
+    Returns the indices of the points to keep, always including the first and
+    last point.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point)
+        if i + 2 < len(edges):
+            nxt_start, nxt_end = edges[i + 1], edges[i + 2]
+        else:
+            nxt_start, nxt_end = n - 1, n
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+
+        bx, by_ = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (by_ - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def bin_edges(values, bins):
+    """Histogram bin edges for pre-binned bar charts.
+
+    Integer values spanning at most `bins` numbers get one bin per whole
+    number; anything else gets `bins` equal-width bins.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return np.array([0.0, 1.0])
+    low, high = values.min(), values.max()
+    if np.all(np.mod(values, 1) == 0) and high - low + 1 <= bins:
+        return np.arange(low - 0.5, high + 1.5)
+    return np.histogram_bin_edges(values, bins=bins)
+
+
+def box_stats(values):
+    """Quartiles and whiskers of a box plot, for go.Box(q1=..., ...).
+
+    Matches what Plotly computes from raw values: linear quartiles, whiskers
+    at the furthest values within 1.5 IQR of the box.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {key: np.nan for key in ('q1', 'median', 'q3', 'lowerfence', 'upperfence')}
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'lowerfence': values[values >= q1 - 1.5 * iqr].min(),
+        'upperfence': values[values <= q3 + 1.5 * iqr].max(),
+    }
@@ -0,0 +1,177 @@
+"""
+Indexed customer and order drill-down.
+
+Customer and order IDs are dictionary-encoded once (sorted pd.factorize), so
+a lookup is one hash-table probe that yields an integer code. Orders are
+grouped by customer and items by order with CSR-style offset arrays:
+
+    customer_orders[customer_offsets[c]:customer_offsets[c + 1]]  -> order codes of c
+    items[order_offsets[o]:order_offsets[o + 1]]                   -> item rows of o
+
+All tables are stored column-wise as NumPy arrays aligned to the codes (RFM
+and location per customer, order facts and delivery outcome per order), so
+memory grows linearly with the number of rows and no lookup scans a frame.
+"""
+import numpy as np
+import pandas as pd
+
+# payment_value is the order's total payment (repeated on each item row), as used by
+# the revenue KPIs and RFM monetary
+ORDER_COLUMNS = ['order_id', 'customer_unique_id', 'order_purchase_timestamp', 'payment_type', 'payment_value',
+                 'review_score', 'order_delivered_customer_date', 'order_estimated_delivery_date']
+ITEM_COLUMNS = ['order_item_id', 'product_id', 'product_category_name_english', 'seller_id',
+                'seller_city', 'seller_state', 'price', 'freight_value']
+DELIVERY_COLUMNS = ['actual_delivery_time', 'estimated_delivery_time', 'delivery_diff', 'on_time']
+RFM_COLUMNS = ['recency', 'frequency', 'monetary', 'segment', 'cluster']
+LOCATION_COLUMNS = ['customer_city', 'customer_state', 'geolocation_lat', 'geolocation_lng']
+
+
+def _offsets(codes, n):
+    """CSR offsets for rows grouped by code (codes must be sorted)"""
+    return np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n))]).astype(np.int64)
+
+
+def _aligned(frame, key, ids, columns):
+    """Columns of frame reindexed to ids (missing ids give NaN), as NumPy arrays"""
+    columns = [col for col in columns if frame is not None and col in frame.columns]
+    if not columns:
+        return {}, np.zeros(len(ids), dtype=bool)
+    positions = pd.Index(frame[key].drop_duplicates()).get_indexer(ids)
+    frame = frame.drop_duplicates(key)
+    found = positions >= 0
+    arrays = {}
+    for col in columns:
+        values = frame[col].to_numpy()
+        if values.dtype.kind in 'iuf':
+            values = values.astype(float)
+            out = np.full(len(ids), np.nan)
+        else:
+            out = np.full(len(ids), None, dtype=object)
+        out[found] = values[positions[found]]
+        arrays[col] = out
+    return arrays, found
+
+
+class DrillDownIndex:
+    """Key indexes from customers to orders and from orders to items"""
+
+    def __init__(self, customer_ids, order_ids, customer_offsets, customer_orders, order_offsets,
+                 orders, items, rfm, has_rfm, locations, has_location):
+        self.customer_ids = customer_ids        # pd.Index, code -> customer_unique_id
+        self.order_ids = order_ids              # pd.Index, code -> order_id
+        self.customer_offsets = customer_offsets
+        self.customer_orders = customer_orders  # order codes grouped by customer, oldest first
+        self.order_offsets = order_offsets
+        self.orders = orders                    # column -> array aligned to order codes
+        self.items = items                      # column -> array grouped by order code
+        self.rfm = rfm                          # column -> array aligned to customer codes
+        self.has_rfm = has_rfm
+        self.locations = locations
+        self.has_location = has_location
+
+    @classmethod
+    def build(cls, orders_df, rfm_df=None, delivery_df=None, customers_geo=None):
+        """Build from the item-level orders frame plus the optional per-customer/order exports"""
+        items = orders_df
+        if 'order_item_id' in items.columns:
+            # Orders with several payments repeat their item rows
+            items = items.drop_duplicates(['order_id', 'order_item_id'])
+        order_codes, order_ids = pd.factorize(items['order_id'], sort=True)
+        item_no = items['order_item_id'].to_numpy() if 'order_item_id' in items.columns else np.zeros(len(items))
+        item_rows = np.lexsort((item_no, order_codes))
+        order_offsets = _offsets(order_codes[item_rows], len(order_ids))
+
+        item_table = {col: items[col].to_numpy()[item_rows] for col in ITEM_COLUMNS if col in items.columns}
+        first_rows = item_rows[order_offsets[:-1]]
+        orders = {col: items[col].to_numpy()[first_rows] for col in ORDER_COLUMNS if col in items.columns}
+        orders['items'] = np.diff(order_offsets)
+        if 'price' in item_table:
+            value = item_table['price'] + item_table.get('freight_value', 0)
+            orders['order_value'] = np.add.reduceat(value, order_offsets[:-1]) if len(value) else value
+        delivery, _ = _aligned(delivery_df, 'order_id', order_ids, DELIVERY_COLUMNS)
+        orders.update(delivery)
+
+        customer_codes, customer_ids = pd.factorize(orders['customer_unique_id'], sort=True)
+        timestamps = pd.to_datetime(orders['order_purchase_timestamp']).to_numpy() \
+            if 'order_purchase_timestamp' in orders else np.zeros(len(order_ids))
+        customer_orders = np.lexsort((timestamps, customer_codes))
+        customer_offsets = _offsets(customer_codes[customer_orders], len(customer_ids))
+
+        rfm, has_rfm = _aligned(rfm_df, 'customer_unique_id', customer_ids, RFM_COLUMNS)
+        locations, has_location = _aligned(customers_geo, 'customer_unique_id', customer_ids, LOCATION_COLUMNS)
+        if not has_location.any():
+            # Fall back to city/state from the orders themselves (latest order)
+            last = customer_orders[customer_offsets[1:] - 1]
+            locations = {col: items[col].to_numpy()[first_rows][last]
+                         for col in LOCATION_COLUMNS if col in items.columns}
+            has_location = np.ones(len(customer_ids), dtype=bool)
+
+        customer_ids, order_ids = pd.Index(customer_ids), pd.Index(order_ids)
+        # pandas builds an Index's hash table on its first lookup; do one lookup on
+        # each now so the first search does not pay for it
+        for index in (customer_ids, order_ids):
+            index.get_indexer(index[:1])
+        return cls(customer_ids, order_ids, customer_offsets, customer_orders,
+                   order_offsets, orders, item_table, rfm, has_rfm, locations, has_location)
+
+    def customer_code(self, customer_unique_id):
+        """Integer code of a customer, or None if unknown"""
+        try:
+            return self.customer_ids.get_loc(customer_unique_id)
+        except KeyError:
+            return None
+
+    def order_code(self, order_id):
+        """Integer code of an order, or None if unknown"""
+        try:
+            return self.order_ids.get_loc(order_id)
+        except KeyError:
+            return None
+
+    def customer(self, customer_unique_id):
+        """RFM row, location and orders (oldest first) of one customer, or None"""
+        code = self.customer_code(customer_unique_id)
+        if code is None:
+            return None
+        order_codes = self.customer_orders[self.customer_offsets[code]:self.customer_offsets[code + 1]]
+        return {
+            'customer_unique_id': customer_unique_id,
+            'rfm': {col: values[code] for col, values in self.rfm.items()} if self.has_rfm[code] else None,
+            'location': {col: values[code] for col, values in self.locations.items()}
+            if self.has_location[code] else None,
+            'orders': {col: values[order_codes] for col, values in self.orders.items()},
+        }
+
+    def order(self, order_id):
+        """Order facts, delivery outcome and items of one order, or None"""
+        code = self.order_code(order_id)
+        if code is None:
+            return None
+        start, end = self.order_offsets[code], self.order_offsets[code + 1]
+        return {
+            'order': {col: values[code] for col, values in self.orders.items()},
+            'items': {col: values[start:end] for col, values in self.items.items()},
+        }
+
+    def search(self, key):
+        """Look a key up as customer_unique_id, then as order_id; returns (kind, result) or None"""
+        key = key.strip()
+        result = self.customer(key)
+        if result is not None:
+            return 'customer', result
+        result = self.order(key)
+        if result is not None:
+            return 'order', result
+        return None
+
+    def stats(self):
+        """Sizes of the index (bytes count array buffers; object arrays hold pointers)"""
+        arrays = [self.customer_offsets, self.customer_orders, self.order_offsets,
+                  *self.orders.values(), *self.items.values(), *self.rfm.values(), *self.locations.values()]
+        return {
+            'customers': len(self.customer_ids),
+            'orders': len(self.order_ids),
+            'items': int(self.order_offsets[-1]),
+            'bytes': int(sum(a.nbytes for a in arrays)
+                         + self.customer_ids.memory_usage() + self.order_ids.memory_usage()),
+        }
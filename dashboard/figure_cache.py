@@ -0,0 +1,78 @@
+"""
+Plotly figure cache.
+
+Building a figure with plotly.express costs tens of milliseconds, while most
+dashboard charts only depend on the static summary files. FigureCache keeps
+the built Figure keyed by dataset version, chart name and chart parameters,
+so reruns hand Streamlit a ready figure instead of rebuilding it
+(st.plotly_chart validates and serializes the figure itself, so there is no
+point in caching its JSON as well).
+"""
+import threading
+from collections import OrderedDict
+
+from result_cache import make_key
+
+
+class FigureCache:
+    """LRU cache of built figures for one dataset version"""
+
+    def __init__(self, version, max_entries=256):
+        self.version = version
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> Figure
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, name, **params):
+        return make_key(self.version, name, **params)
+
+    def get(self, name, build, **params):
+        """Return the cached figure for name/params, building it on a miss"""
+        key = self.key(name, **params)
+        with self._lock:
+            fig = self._entries.get(key)
+            if fig is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+
+        fig = build()
+        with self._lock:
+            self._entries[key] = fig
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fig
+
+    def prewarm(self, charts, datasets):
+        """Build every chart whose input datasets are available.
+
+        charts maps a chart name to (builder, dataset names) and datasets maps
+        dataset names to frames. Returns the names that were built.
+        """
+        built = []
+        for name, (builder, inputs) in charts.items():
+            frames = [datasets.get(i) for i in inputs]
+            if any(df is None or df.empty for df in frames):
+                continue
+            try:
+                self.get(name, lambda: builder(*frames))
+            except KeyError:
+                # Optional columns (e.g. segment/cluster) missing from this export
+                continue
+            built.append(name)
+        return built
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
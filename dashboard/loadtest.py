@@ -0,0 +1,380 @@
+"""
+Concurrent-session load testing for the Streamlit dashboard.
+
+The harness starts one dashboard server (through the same bootstrap as
+`streamlit run`), or targets a running one with --url, and connects N
+simulated browser sessions to its /_stcore/stream websocket. Sessions speak
+Streamlit's protobuf protocol: a rerun sends a BackMsg with the widget states
+the user set and is timed until the server's script_finished message. All
+sessions therefore share one server process, its st.cache_resource objects,
+script threads and GIL, as real users do. Sessions warm up, wait on a barrier
+and then run scripted user journeys at the same time:
+
+- page_tour: switch through every page with the sidebar radio
+- sales_filter: open Sales Analysis and change the date_input range
+- geo_heatmap: open the Geographic Analysis heatmap from another page
+
+For each session count the harness reports throughput (reruns per second
+across all sessions), p50/p95/p99 rerun latency overall and per journey, the
+first-run time of a new session, and the server's resident memory (RSS) and
+CPU use. The cold start (first run after the server starts, including data
+loading) is reported once.
+
+Usage:
+    python dashboard/loadtest.py --sessions 1,2,4,8 -o loadtest_report.json
+    python dashboard/loadtest.py --data-dir exports/   # offline, see README for the files
+    python dashboard/loadtest.py --url http://localhost:8501   # already running server
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import psutil
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, 'dashboard.py')
+# dashboard.py reads its CSVs from the GitHub raw URLs under this prefix
+RAW_DATA_PREFIX = 'https://raw.githubusercontent.com/bills1912/brazil-ecommerce-project/refs/heads/main/'
+RERUN_TIMEOUT = float(os.environ.get('LOADTEST_RERUN_TIMEOUT', 120))
+SERVER_START_TIMEOUT = float(os.environ.get('LOADTEST_SERVER_START_TIMEOUT', 60))
+# Streamlit's own default for server.maxMessageSize (MB)
+MAX_MESSAGE_SIZE = 200 * 2 ** 20
+PERCENTILES = (50, 95, 99)
+SIDEBAR = 1  # root container index of the sidebar in ForwardMsg delta paths
+DATE_FORMAT = '%Y/%m/%d'  # date_input wire format
+
+PAGE_OVERVIEW = "📊 Overview"
+PAGE_SALES = "📈 Sales Analysis"
+PAGE_GEOGRAPHIC = "🗺️ Geographic Analysis"
+
+
+class Session:
+    """One simulated browser tab connected to the server websocket"""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.conn = None
+        self.radio = None       # sidebar page radio (Radio proto) from the last run
+        self.date_input = None  # Sales date range (DateInput proto), if the last run showed it
+        self.page = 0
+        self.date_range = None
+        self.exceptions = []    # exceptions rendered by the last run
+        self.alerts = []        # st.error bodies rendered by the last run
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+
+        url = 'ws' + self.url[len('http'):].rstrip('/') + '/_stcore/stream'
+        self.conn = await websocket_connect(url, subprotocols=['streamlit'], max_message_size=MAX_MESSAGE_SIZE)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+    async def rerun(self):
+        """Send the current widget states and wait for the script run to finish; returns seconds"""
+        from streamlit.proto.Alert_pb2 import Alert
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.widget_states.SetInParent()
+        widgets = msg.rerun_script.widget_states.widgets
+        if self.radio is not None:
+            state = widgets.add()
+            state.id = self.radio.id
+            state.int_value = self.page
+        if self.date_input is not None and self.date_range:
+            state = widgets.add()
+            state.id = self.date_input.id
+            state.string_array_value.data.extend(self.date_range)
+
+        started = time.perf_counter()
+        await self.conn.write_message(msg.SerializeToString(), binary=True)
+        self.exceptions, self.alerts = [], []
+        radio = date_input = None
+        while True:
+            payload = await asyncio.wait_for(self.conn.read_message(), self.timeout)
+            if payload is None:
+                raise ConnectionError("server closed the websocket")
+            reply = ForwardMsg()
+            reply.ParseFromString(payload)
+            kind = reply.WhichOneof('type')
+            if kind == 'script_finished':
+                if reply.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                if reply.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.exceptions.append("script compile error")
+                break
+            if kind != 'delta' or reply.delta.WhichOneof('type') != 'new_element':
+                continue
+            element = reply.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type == 'radio' and radio is None and reply.metadata.delta_path[0] == SIDEBAR:
+                radio = element.radio
+            elif element_type == 'date_input' and element.date_input.is_range:
+                date_input = element.date_input
+            elif element_type == 'exception':
+                self.exceptions.append(element.exception.message)
+            elif element_type == 'alert' and element.alert.format == Alert.ERROR:
+                self.alerts.append(element.alert.body)
+        elapsed = time.perf_counter() - started
+        self.radio = radio or self.radio
+        self.date_input = date_input
+        return elapsed
+
+    def goto(self, page):
+        self.page = list(self.radio.options).index(page) if isinstance(page, str) else page
+        self.date_range = None
+        return self.rerun()
+
+    def random_date_range(self, rng):
+        """Pick a 30-365 day window inside the Sales date_input bounds"""
+        low = datetime.strptime(self.date_input.min, DATE_FORMAT)
+        high = datetime.strptime(self.date_input.max, DATE_FORMAT)
+        span = (high - low).days
+        start = low + timedelta(days=int(rng.integers(0, max(span - 30, 1))))
+        end = min(start + timedelta(days=int(rng.integers(30, 366))), high)
+        self.date_range = [start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT)]
+        return self.rerun()
+
+
+# User journeys: generators of (step name, rerun coroutine factory) for one session
+def page_tour(session, rng):
+    for index, page in enumerate(session.radio.options):
+        yield f'page:{page}', lambda index=index: session.goto(index)
+
+
+def sales_filter(session, rng, changes=3):
+    yield f'page:{PAGE_SALES}', lambda: session.goto(PAGE_SALES)
+    for _ in range(changes):
+        yield 'date_range', lambda: session.random_date_range(rng)
+
+
+def geo_heatmap(session, rng):
+    yield f'page:{PAGE_OVERVIEW}', lambda: session.goto(PAGE_OVERVIEW)
+    yield 'geo_heatmap', lambda: session.goto(PAGE_GEOGRAPHIC)
+
+
+JOURNEYS = {
+    'page_tour': page_tour,
+    'sales_filter': sales_filter,
+    'geo_heatmap': geo_heatmap,
+}
+
+
+def _use_local_data(data_dir):
+    """Serve the dashboard's GitHub raw CSV reads from a local directory"""
+    read_csv = pd.read_csv
+
+    def local_read_csv(path, *args, **kwargs):
+        if isinstance(path, str) and path.startswith(RAW_DATA_PREFIX):
+            path = os.path.join(data_dir, path.rsplit('/', 1)[1])
+        return read_csv(path, *args, **kwargs)
+
+    pd.read_csv = local_read_csv
+
+
+def serve(port, data_dir=None):
+    """Run the dashboard server in this process, as `streamlit run dashboard.py` does"""
+    from streamlit.web import bootstrap
+
+    if data_dir:
+        _use_local_data(os.path.abspath(data_dir))
+    os.chdir(APP_DIR)
+    flag_options = {'server_port': port, 'server_headless': True, 'server_fileWatcherType': 'none',
+                    'browser_gatherUsageStats': False}
+    bootstrap.load_config_options(flag_options)
+    bootstrap.run(APP_PATH, False, [], flag_options)
+
+
+def start_server(data_dir=None):
+    """Start a dashboard server on a free port; returns (process, url)"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    command = [sys.executable, os.path.abspath(__file__), '--serve', str(port)]
+    if data_dir:
+        command += ['--data-dir', os.path.abspath(data_dir)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"dashboard server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url + '/_stcore/health', timeout=1):
+                return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"dashboard server did not answer on {url} within {SERVER_START_TIMEOUT:.0f}s")
+
+
+async def _session(index, url, options, barrier, result):
+    """One simulated user: connect, warm up, then run the journeys after the barrier"""
+    session = Session(url, options['timeout'])
+    rng = np.random.default_rng(options['seed'] + index)
+    try:
+        await session.connect()
+        result['first_run'] = await session.rerun()
+        if session.radio is None:
+            # load_data() shows st.error and stops when a CSV is missing
+            raise RuntimeError("dashboard did not render its page selector: "
+                               + ("; ".join(session.alerts + session.exceptions) or "no error shown"))
+        # One untimed pass so every session measures warm reruns
+        for journey in JOURNEYS.values():
+            for _, step in journey(session, rng):
+                await step()
+    except Exception as e:
+        result['errors'].append(f'warm-up: {e}')
+    await barrier.wait()
+    if result['errors']:
+        session.close()
+        return
+
+    names = list(JOURNEYS)
+    result['started'] = time.time()
+    try:
+        for iteration in range(options['iterations']):
+            # Rotate the journey order so sessions do not move in lockstep
+            shift = (index + iteration) % len(names)
+            for name in names[shift:] + names[:shift]:
+                for step_name, step in JOURNEYS[name](session, rng):
+                    result['records'].append((name, step_name, await step()))
+                    result['errors'].extend(f'{step_name}: {message}' for message in session.exceptions)
+    except Exception as e:
+        result['errors'].append(f'journey: {e!r}')
+    result['finished'] = time.time()
+    session.close()
+
+
+async def _sample_memory(process, peak, interval=0.1):
+    """Track the peak RSS of the server process until cancelled"""
+    while True:
+        peak[0] = max(peak[0], process.memory_info().rss)
+        await asyncio.sleep(interval)
+
+
+def _latency_stats(latencies):
+    latencies = np.asarray(latencies, dtype=float) * 1000
+    if not len(latencies):
+        return {'reruns': 0}
+    stats = {'reruns': len(latencies), 'mean_ms': float(latencies.mean())}
+    stats.update({f'p{p}_ms': float(np.percentile(latencies, p)) for p in PERCENTILES})
+    return stats
+
+
+async def run_level(sessions, url, options, server=None):
+    """Run `sessions` concurrent sessions against one server and summarize them"""
+    barrier = asyncio.Barrier(sessions)
+    results = [{'session': i, 'records': [], 'errors': []} for i in range(sessions)]
+    peak = [server.memory_info().rss if server else 0]
+    sampler = asyncio.create_task(_sample_memory(server, peak)) if server else None
+    cpu_before = server.cpu_times() if server else None
+
+    await asyncio.gather(*(_session(i, url, options, barrier, results[i]) for i in range(sessions)))
+
+    if sampler:
+        sampler.cancel()
+    records = pd.DataFrame([record for result in results for record in result['records']],
+                           columns=['journey', 'step', 'seconds'])
+    measured = [result for result in results if 'finished' in result]
+    wall = (max(r['finished'] for r in measured) - min(r['started'] for r in measured)) if measured else 0
+    first_runs = [r['first_run'] for r in results if 'first_run' in r]
+    server_stats = None
+    if server:
+        cpu_after = server.cpu_times()
+        cpu = (cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system)
+        server_stats = {'rss_mb': server.memory_info().rss / 2 ** 20, 'peak_rss_mb': peak[0] / 2 ** 20,
+                        'cpu_seconds': cpu}
+
+    return {
+        'sessions': sessions,
+        'completed_sessions': len(measured),
+        'wall_seconds': wall,
+        'throughput_rps': len(records) / wall if wall else 0.0,
+        'latency': _latency_stats(records['seconds']),
+        'journeys': {name: _latency_stats(group['seconds']) for name, group in records.groupby('journey')},
+        'first_run_s': float(np.median(first_runs)) if first_runs else None,
+        'server': server_stats,
+        'errors': [f"session {r['session']}: {error}" for r in results for error in r['errors']],
+    }
+
+
+async def cold_start(url, timeout):
+    """Time the first run after the server starts (data loading and cache builds)"""
+    session = Session(url, timeout)
+    await session.connect()
+    try:
+        return await session.rerun()
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for dashboard.py")
+    parser.add_argument('--sessions', default='1,2,4,8', help="comma-separated concurrent session counts")
+    parser.add_argument('--iterations', type=int, default=2, help="journey rounds per session")
+    parser.add_argument('--timeout', type=float, default=RERUN_TIMEOUT, help="seconds allowed per rerun")
+    parser.add_argument('--data-dir', default=None, help="read the dashboard CSVs from this directory")
+    parser.add_argument('--url', default=None, help="load test a running server instead of starting one")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', default=None, help="write the JSON report here")
+    parser.add_argument('--serve', type=int, default=None, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve is not None:
+        serve(args.serve, args.data_dir)
+        return 0
+
+    options = {'iterations': args.iterations, 'timeout': args.timeout,
+               'data_dir': args.data_dir, 'seed': args.seed}
+    process, url, server = None, args.url, None
+    if url is None:
+        process, url = start_server(args.data_dir)
+        server = psutil.Process(process.pid)
+    levels = []
+    try:
+        cold = asyncio.run(cold_start(url, args.timeout)) if process else None
+        if cold is not None:
+            print(f"Server cold start (first run): {cold:.1f}s")
+        print(f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'server MB':>10} {'CPU s':>7} {'errors':>6}")
+        for sessions in (int(s) for s in args.sessions.split(',')):
+            level = asyncio.run(run_level(sessions, url, options, server))
+            levels.append(level)
+            latency, stats = level['latency'], level['server'] or {}
+            print(f"{sessions:>8} {level['throughput_rps']:>9.2f} {latency.get('p50_ms', np.nan):>8.0f} "
+                  f"{latency.get('p95_ms', np.nan):>8.0f} {latency.get('p99_ms', np.nan):>8.0f} "
+                  f"{stats.get('peak_rss_mb', np.nan):>10.0f} {stats.get('cpu_seconds', np.nan):>7.1f} "
+                  f"{len(level['errors']):>6}")
+            for error in level['errors'][:5]:
+                print(f"         {error}")
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.output:
+        report = {'generated_at': pd.Timestamp.now(tz='UTC').isoformat(), 'cpu_count': os.cpu_count(),
+                  'url': args.url, 'cold_start_s': cold, 'options': options, 'levels': levels}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 1 if any(level['errors'] for level in levels) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
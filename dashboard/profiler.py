@@ -0,0 +1,362 @@
+"""
+Single-pass data-quality profiler for the Olist extracts.
+
+Each CSV is read once in chunks and every column is profiled on the fly:
+null counts, distinct counts (exact hash sets that switch to HyperLogLog
+past a size limit), duplicate rows from 64-bit row hashes, min/max/mean and
+t-digest quantiles for numeric and datetime columns, string lengths and
+top-k value counts from a bounded Space-Saving summary. Files are profiled
+in parallel worker processes and the result is written as a JSON report.
+
+Usage:
+    python dashboard/profiler.py data/*.csv -o quality_report.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sketches import Moments, TDigest
+
+PROFILE_CHUNK_SIZE = int(os.environ.get('PROFILE_CHUNK_SIZE', 100_000))
+# Columns keep exact distinct hashes up to this many values, then use HyperLogLog
+EXACT_DISTINCT_LIMIT = int(os.environ.get('EXACT_DISTINCT_LIMIT', 200_000))
+# Row hashes (for duplicate rows) stay exact up to this many distinct rows
+EXACT_ROW_LIMIT = int(os.environ.get('EXACT_ROW_LIMIT', 5_000_000))
+TOP_K = 10
+# Candidate values tracked per column for top-k (Space-Saving capacity)
+TOP_K_CAPACITY = 1000
+HLL_PRECISION = 14
+# t-digest compression for column quantiles (finer than the dashboard sketches)
+PROFILE_COMPRESSION = 500
+QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+# Primary key of each Olist dataset, checked for nulls and duplicates
+KEY_COLUMNS = {
+    'olist_customers_dataset': ['customer_id'],
+    'olist_orders_dataset': ['order_id'],
+    'olist_order_items_dataset': ['order_id', 'order_item_id'],
+    'olist_order_payments_dataset': ['order_id', 'payment_sequential'],
+    'olist_products_dataset': ['product_id'],
+    'olist_sellers_dataset': ['seller_id'],
+    'product_category_name_translation': ['product_category_name'],
+}
+
+NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+class HyperLogLog:
+    """Distinct-count sketch over 64-bit hashes"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes << np.uint64(p)
+        leading = np.full(len(hashes), 64 - p, dtype=np.int64)
+        nonzero = rest > 0
+        leading[nonzero] = 63 - np.floor(np.log2(rest[nonzero].astype(float))).astype(np.int64)
+        rank = np.minimum(leading + 1, 64 - p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(float)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class DistinctCounter:
+    """Exact distinct count over hashes until `limit` values, HyperLogLog after"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.hll = None
+
+    def add(self, hashes):
+        if self.hll is not None:
+            self.hll.add(hashes)
+            return
+        self.hashes = np.union1d(self.hashes, hashes)
+        if len(self.hashes) > self.limit:
+            self.hll = HyperLogLog()
+            self.hll.add(self.hashes)
+            self.hashes = None
+
+    @property
+    def exact(self):
+        return self.hll is None
+
+    def count(self):
+        return len(self.hashes) if self.exact else self.hll.count()
+
+
+def _to_builtin(value):
+    """JSON-friendly scalar"""
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        return int(value) if float(value).is_integer() else float(value)
+    return value
+
+
+class ColumnProfile:
+    """Running profile of one column"""
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind  # 'numeric', 'datetime' or 'string'
+        self.count = 0
+        self.nulls = 0
+        self.invalid = 0
+        self.distinct = DistinctCounter(EXACT_DISTINCT_LIMIT)
+        self.top = pd.Series(dtype=float)
+        # Space-Saving: untracked values occurred at most top_floor times (the largest
+        # evicted count), and top_errors bounds how much each tracked count overestimates
+        self.top_errors = pd.Series(dtype=float)
+        self.top_floor = 0
+        self.moments = Moments()
+        self.digest = TDigest(compression=PROFILE_COMPRESSION)
+        self.lengths = Moments()
+
+    def update(self, raw, hashes):
+        """Add one chunk; raw is the column as read, hashes its normalized value hashes"""
+        present = raw.notna().to_numpy()
+        self.count += len(raw)
+        self.nulls += int((~present).sum())
+        self.distinct.add(hashes[present])
+
+        counts = raw[present].value_counts(sort=False)
+        # A value entering the summary may have been evicted before, up to top_floor times
+        entering = pd.Series(self.top_floor, index=counts.index[~counts.index.isin(self.top.index)])
+        self.top = self.top.add(counts, fill_value=0).add(entering, fill_value=0)
+        self.top_errors = self.top_errors.add(entering, fill_value=0)
+        if len(self.top) > TOP_K_CAPACITY:
+            kept = self.top.nlargest(TOP_K_CAPACITY)
+            self.top_floor = max(self.top_floor, int(self.top.drop(kept.index).max()))
+            self.top = kept
+            self.top_errors = self.top_errors.reindex(kept.index)
+
+        if self.kind == 'string':
+            lengths = raw[present].astype(str).str.len().to_numpy(float)
+            self.lengths = _merge_moments(self.lengths, lengths)
+            return
+
+        values = _numeric_values(raw[present], self.kind)
+        self.invalid += int(np.isnan(values).sum())
+        values = values[~np.isnan(values)]
+        self.moments = _merge_moments(self.moments, values)
+        self.digest = self.digest.merge(TDigest.from_values(values, PROFILE_COMPRESSION))
+
+    def report(self):
+        non_null = self.count - self.nulls
+        distinct = self.distinct.count()
+        top = self.top.nlargest(TOP_K)
+        top_error = int(self.top_errors.reindex(top.index).max()) if len(top) else 0
+        result = {
+            'kind': self.kind,
+            'nulls': self.nulls,
+            'null_rate': self.nulls / self.count if self.count else None,
+            'distinct': distinct,
+            'distinct_exact': self.distinct.exact,
+            # Repeated non-null values (what Series.duplicated().sum() reports)
+            'duplicates': max(non_null - distinct, 0),
+            'top_values': [[_to_builtin(value), int(count)] for value, count in top.items()],
+            # Counts of values that re-entered after evictions are upper bounds
+            'top_values_exact': not top_error,
+            'top_values_max_error': top_error,
+        }
+        if self.kind == 'string':
+            result.update({
+                'min_length': _to_builtin(self.lengths.min),
+                'max_length': _to_builtin(self.lengths.max),
+                'mean_length': _to_builtin(self.lengths.mean) if self.lengths.count else None,
+            })
+            return result
+
+        quantiles = np.atleast_1d(self.digest.quantile(list(QUANTILES)))
+        stats = {'min': self.moments.min, 'max': self.moments.max,
+                 'mean': self.moments.mean if self.moments.count else np.nan}
+        stats.update({f'p{round(q * 100):g}': value for q, value in zip(QUANTILES, quantiles)})
+        if self.kind == 'datetime':
+            stats = {key: None if np.isnan(value) else pd.Timestamp(int(value)).isoformat()
+                     for key, value in stats.items()}
+            result['unparseable'] = self.invalid
+        else:
+            stats = {key: _to_builtin(value) for key, value in stats.items()}
+            stats['std'] = _to_builtin(self.moments.std)
+        result.update(stats)
+        return result
+
+
+def _merge_moments(moments, values):
+    if not len(values):
+        return moments
+    chunk = (len(values), values.mean(), ((values - values.mean()) ** 2).sum(), values.min(), values.max())
+    return Moments.merge_arrays(
+        [moments.count, chunk[0]], [moments.mean, chunk[1]], [moments.m2, chunk[2]],
+        [moments.min, chunk[3]], [moments.max, chunk[4]]
+    )
+
+
+def _numeric_values(raw, kind):
+    if kind == 'datetime':
+        parsed = pd.to_datetime(raw, errors='coerce', format='ISO8601')
+        values = parsed.to_numpy('datetime64[ns]').astype(np.int64).astype(float)
+        values[parsed.isna().to_numpy()] = np.nan
+        return values
+    return pd.to_numeric(raw, errors='coerce').to_numpy(float)
+
+
+def _column_kind(series):
+    """numeric, datetime or string, decided from the first chunk"""
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    sample = series.dropna().head(1000)
+    if len(sample) and sample.astype(str).str.match(r'^\d{4}-\d{2}-\d{2}').mean() >= 0.95:
+        return 'datetime'
+    return 'string'
+
+
+def _value_hashes(series, kind):
+    """64-bit hashes that do not depend on the dtype pandas picked for a chunk"""
+    if kind == 'numeric':
+        values = pd.to_numeric(series, errors='coerce').to_numpy(float)
+    else:
+        values = series.astype(object).where(series.notna(), None).to_numpy()
+    hashes = pd.util.hash_array(values)
+    hashes[series.isna().to_numpy()] = NULL_HASH
+    return hashes
+
+
+def profile_file(path, chunk_size=PROFILE_CHUNK_SIZE, key_columns=None):
+    """Profile one CSV in a single chunked pass"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    key_columns = KEY_COLUMNS.get(name, []) if key_columns is None else list(key_columns)
+    started = time.perf_counter()
+
+    columns = {}
+    rows = 0
+    row_distinct = DistinctCounter(EXACT_ROW_LIMIT)
+    key_distinct = DistinctCounter(EXACT_ROW_LIMIT)
+    key_nulls = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size, low_memory=False):
+        if not columns:
+            columns = {col: ColumnProfile(col, _column_kind(chunk[col])) for col in chunk.columns}
+            key_columns = [col for col in key_columns if col in columns]
+        rows += len(chunk)
+
+        row_hash = np.zeros(len(chunk), dtype=np.uint64)
+        key_hash = np.zeros(len(chunk), dtype=np.uint64)
+        for col, profile in columns.items():
+            hashes = _value_hashes(chunk[col], profile.kind)
+            profile.update(chunk[col], hashes)
+            with np.errstate(over='ignore'):
+                row_hash = row_hash * np.uint64(1_000_003) ^ hashes
+                if col in key_columns:
+                    key_hash = key_hash * np.uint64(1_000_003) ^ hashes
+        row_distinct.add(row_hash)
+        if key_columns:
+            key_missing = chunk[key_columns].isna().any(axis=1).to_numpy()
+            key_nulls += int(key_missing.sum())
+            key_distinct.add(key_hash[~key_missing])
+
+    report = {
+        'path': path,
+        'rows': rows,
+        'columns': len(columns),
+        'duplicate_rows': rows - row_distinct.count(),
+        'duplicate_rows_exact': row_distinct.exact,
+        'column_profiles': {col: profile.report() for col, profile in columns.items()},
+    }
+    if key_columns:
+        report['key'] = {
+            'columns': key_columns,
+            'nulls': key_nulls,
+            'duplicates': rows - key_nulls - key_distinct.count(),
+        }
+    report['issues'] = _issues(report)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return name, report
+
+
+def _issues(report):
+    """Findings an ingest gate should look at"""
+    issues = []
+    if report['duplicate_rows']:
+        issues.append(f"{report['duplicate_rows']} duplicate rows")
+    key = report.get('key')
+    if key and key['nulls']:
+        issues.append(f"{key['nulls']} rows with a null key ({', '.join(key['columns'])})")
+    if key and key['duplicates']:
+        issues.append(f"{key['duplicates']} duplicate keys ({', '.join(key['columns'])})")
+    for col, profile in report['column_profiles'].items():
+        if profile['nulls'] == report['rows'] and report['rows']:
+            issues.append(f"column {col} is empty")
+        if profile.get('unparseable'):
+            issues.append(f"{profile['unparseable']} unparseable dates in {col}")
+    return issues
+
+
+def profile_files(paths, max_workers=None, chunk_size=PROFILE_CHUNK_SIZE):
+    """Profile several CSVs in parallel processes; returns the full report"""
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(profile_file, paths, [chunk_size] * len(paths))
+        files = dict(results)
+    return {
+        'generated_at': pd.Timestamp.now(tz='UTC').isoformat(),
+        'seconds': round(time.perf_counter() - started, 3),
+        'files': files,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Data-quality report for CSV extracts")
+    parser.add_argument('paths', nargs='+', help="CSV files or directories of CSV files")
+    parser.add_argument('-o', '--output', default='quality_report.json', help="report path")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="parallel processes")
+    parser.add_argument('--chunk-size', type=int, default=PROFILE_CHUNK_SIZE)
+    parser.add_argument('--strict', action='store_true', help="exit with status 1 when issues are found")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.csv')))
+        else:
+            paths.append(path)
+
+    report = profile_files(paths, args.workers, args.chunk_size)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    issues = 0
+    for name, result in report['files'].items():
+        print(f"{name}: {result['rows']:,} rows, {result['columns']} columns, {result['seconds']:.1f}s")
+        for issue in result['issues']:
+            print(f"  - {issue}")
+        issues += len(result['issues'])
+    print(f"Report written to {args.output} ({report['seconds']:.1f}s)")
+    return 1 if args.strict and issues else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
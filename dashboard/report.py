@@ -0,0 +1,225 @@
+"""
+Batch renderer for the static report charts.
+
+Every chart in charts.STATIC_CHARTS is built from the precomputed dashboard
+summaries (not the raw Olist tables) and rendered in a process pool into an
+HTML fragment and, when kaleido is installed, a PNG. A manifest keeps the
+fingerprint of each chart's inputs, so charts whose data and builder did not
+change are skipped on the next run. The fragments are bundled into a single
+self-contained report.html.
+
+Usage:
+    python dashboard/report.py -o report                 # HTML bundle
+    python dashboard/report.py -o report --png           # plus PNG per chart
+    python dashboard/report.py --data-dir dashboard/dashboard_data
+"""
+import argparse
+import hashlib
+import html
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import plotly
+import plotly.offline
+
+import downsampling
+from charts import CLUSTER_COLORS, CLUSTER_LABELS, STATIC_CHARTS
+
+DATA_URL = 'https://raw.githubusercontent.com/bills1912/brazil-ecommerce-project/refs/heads/main/dashboard/dashboard_data/'
+
+# Dataset name (as in STATIC_CHARTS) -> summary file
+DATASET_FILES = {
+    'rfm_df': 'rfm_analysis.csv',
+    'monthly_sales': 'monthly_sales.csv',
+    'delivery_df': 'delivery_performance.csv',
+    'state_summary': 'state_summary.csv',
+    'city_summary': 'city_summary.csv',
+    'category_summary': 'category_summary.csv',
+    'payment_summary': 'payment_summary.csv',
+    'product_pairs': 'product_pairs.csv',
+    'review_summary': 'review_summary.csv',
+}
+
+# Chart name prefix -> report section
+SECTIONS = {
+    'overview': "📊 Overview",
+    'sales': "📈 Sales Analysis",
+    'geo': "🗺️ Geographic Analysis",
+    'customer': "👥 Customer Analysis",
+    'delivery': "🚚 Delivery Performance",
+    'rfm': "🎯 RFM Segmentation",
+    'cross': "🔗 Cross-Selling",
+}
+
+PNG_WIDTH = 1200
+PNG_HEIGHT = 700
+PNG_SCALE = 2
+
+
+def load_datasets(source=DATA_URL):
+    """Read the summary files from a directory or URL prefix; missing files give None"""
+    datasets = {}
+    for name, filename in DATASET_FILES.items():
+        path = source.rstrip('/') + '/' + filename if '://' in source else os.path.join(source, filename)
+        try:
+            datasets[name] = pd.read_csv(path)
+        except (OSError, ValueError):
+            datasets[name] = None
+    return datasets
+
+
+def _builder_signature(builder):
+    """Stable description of a builder (function source plus bound partial arguments)"""
+    if hasattr(builder, 'func'):
+        return repr((builder.func.__module__, builder.func.__qualname__, inspect.getsource(builder.func),
+                     builder.args, sorted(builder.keywords.items())))
+    return repr((builder.__module__, builder.__qualname__, inspect.getsource(builder)))
+
+
+def fingerprint(name, frames):
+    """Hash of a chart's input data, builder code (and the downsampling module) and rendering settings"""
+    builder, _ = STATIC_CHARTS[name]
+    digest = hashlib.sha1()
+    digest.update(repr((name, _builder_signature(builder), plotly.__version__, inspect.getsource(downsampling),
+                        downsampling.SCATTER_POINT_BUDGET, downsampling.TREND_POINT_BUDGET,
+                        downsampling.WEBGL_THRESHOLD, CLUSTER_LABELS, CLUSTER_COLORS)).encode())
+    for df in frames:
+        digest.update(repr((df.shape, list(df.columns))).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def render_chart(name, frames, out_dir, png=False):
+    """Build one chart and write its HTML fragment (and PNG); runs in a worker process"""
+    started = time.perf_counter()
+    builder, _ = STATIC_CHARTS[name]
+    fig = builder(*frames)
+    fragment = os.path.join(out_dir, 'charts', f'{name}.html')
+    with open(fragment, 'w', encoding='utf-8') as f:
+        f.write(fig.to_html(full_html=False, include_plotlyjs=False, div_id=name))
+    image = None
+    if png:
+        image = os.path.join(out_dir, 'charts', f'{name}.png')
+        fig.write_image(image, width=PNG_WIDTH, height=PNG_HEIGHT, scale=PNG_SCALE)
+    return name, {'html': fragment, 'png': image, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def _png_available():
+    return importlib.util.find_spec('kaleido') is not None
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_current(entry, digest, png):
+    return (entry.get('fingerprint') == digest
+            and os.path.exists(entry.get('html') or '')
+            and (not png or os.path.exists(entry.get('png') or '')))
+
+
+def write_bundle(out_dir, manifest):
+    """Assemble the chart fragments into one self-contained report.html"""
+    sections = {}
+    for name in STATIC_CHARTS:
+        if name in manifest:
+            section = SECTIONS.get(name.split('_', 1)[0], "Other")
+            sections.setdefault(section, []).append(name)
+
+    parts = [
+        '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+        '<title>Brazilian E-Commerce Report</title>\n'
+        '<style>body{font-family:sans-serif;margin:2rem;} h1{color:#1f77b4;} '
+        '.chart{margin-bottom:2rem;}</style>\n'
+        f'<script type="text/javascript">{plotly.offline.get_plotlyjs()}</script>\n'
+        '</head>\n<body>\n<h1>🛒 Brazilian E-Commerce Report</h1>\n'
+        f'<p>Generated {pd.Timestamp.now():%Y-%m-%d %H:%M}</p>\n'
+    ]
+    for section, names in sections.items():
+        parts.append(f'<h2>{html.escape(section)}</h2>\n')
+        for name in names:
+            with open(manifest[name]['html'], encoding='utf-8') as f:
+                parts.append(f'<div class="chart">\n<h3>{html.escape(name.replace("_", " ").title())}</h3>\n'
+                             f'{f.read()}\n</div>\n')
+    parts.append('</body>\n</html>\n')
+
+    path = os.path.join(out_dir, 'report.html')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(''.join(parts))
+    return path
+
+
+def render_report(datasets, out_dir='report', png=False, workers=None, force=False):
+    """Render changed charts in parallel and rebuild the bundle.
+
+    Returns (rendered names, skipped names, report path).
+    """
+    os.makedirs(os.path.join(out_dir, 'charts'), exist_ok=True)
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    previous = {} if force else _load_manifest(manifest_path)
+
+    manifest, jobs = {}, {}
+    for name, (_, inputs) in STATIC_CHARTS.items():
+        frames = [datasets.get(i) for i in inputs]
+        if any(df is None or df.empty for df in frames):
+            continue
+        digest = fingerprint(name, frames)
+        if _is_current(previous.get(name, {}), digest, png):
+            manifest[name] = previous[name]
+        else:
+            jobs[name] = (frames, digest)
+
+    rendered = []
+    if jobs:
+        names = list(jobs)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(render_chart, name, jobs[name][0], out_dir, png)
+                       for name in names}
+            for name, future in futures.items():
+                try:
+                    _, entry = future.result()
+                except KeyError:
+                    # Optional columns (e.g. segment/cluster) missing from this export
+                    continue
+                manifest[name] = dict(entry, fingerprint=jobs[name][1])
+                rendered.append(name)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    skipped = [name for name in manifest if name not in rendered]
+    return rendered, skipped, write_bundle(out_dir, manifest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the static report charts")
+    parser.add_argument('-o', '--output', default='report', help="output directory")
+    parser.add_argument('--data-dir', default=DATA_URL, help="directory or URL prefix of the summary files")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="parallel processes")
+    parser.add_argument('--png', action='store_true', help="also write a PNG per chart (needs kaleido)")
+    parser.add_argument('--force', action='store_true', help="re-render charts even if unchanged")
+    args = parser.parse_args(argv)
+
+    if args.png and not _png_available():
+        print("PNG export needs kaleido (pip install kaleido); writing HTML only")
+        args.png = False
+
+    started = time.perf_counter()
+    datasets = load_datasets(args.data_dir)
+    rendered, skipped, path = render_report(datasets, args.output, args.png, args.workers, args.force)
+    print(f"{len(rendered)} charts rendered, {len(skipped)} unchanged, "
+          f"{time.perf_counter() - started:.1f}s -> {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Shared result cache for the dashboard.
+
+Streamlit reruns the whole script on every widget interaction, and every
+session recomputes the same derived frames (filtered orders, category counts,
+histograms). ResultCache keeps those results in process memory, shared by all
+sessions, under a byte budget with LRU eviction. Evicted entries can optionally
+be spilled to a local directory and promoted back on the next hit. Spill files
+are named <dataset version>-<key hash>.pkl; on startup the cache re-indexes the
+files of its own version and deletes those of other versions.
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+def dataset_version(*frames):
+    """Cheap fingerprint of the loaded datasets (shape, columns, numeric sums, edge rows)"""
+    digest = hashlib.sha1()
+    for df in frames:
+        if df is None:
+            digest.update(b'none')
+            continue
+        digest.update(repr((df.shape, list(df.columns))).encode())
+        digest.update(df.select_dtypes('number').sum().to_numpy().tobytes())
+        edges = pd.concat([df.head(5), df.tail(5)])
+        digest.update(pd.util.hash_pandas_object(edges, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def _normalize(value):
+    """Turn filter values into a stable, hashable form"""
+    if isinstance(value, (pd.Timestamp, datetime, date, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _normalize(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_normalize(v) for v in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    return value
+
+
+def make_key(version, page, **params):
+    """Build a cache key from dataset version, page name and filter parameters"""
+    normalized = repr((page, _normalize(params)))
+    return f"{version}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+def estimate_size(value):
+    """Approximate in-memory size of a cached value in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(value, pd.DataFrame) else int(usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a byte budget and optional disk spill"""
+
+    def __init__(self, max_bytes=256 * 1024 ** 2, spill_dir=None, spill_max_bytes=1024 ** 3, version=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.version = version
+        self._entries = OrderedDict()   # key -> (value, size)
+        self._spilled = OrderedDict()   # spill file name -> size on disk, oldest first
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._index_spill_dir()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries or self._spill_name(key) in self._spilled
+
+    def get(self, key, default=None):
+        """Return the cached value for key, promoting spilled entries back to memory"""
+        name = self._spill_name(key)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            spilled = name in self._spilled
+        if spilled:
+            # Read the spill file without the lock so other sessions' hits are not blocked
+            value = self._read_spilled(name)
+            size = estimate_size(value) if value is not None else 0
+            with self._lock:
+                if key in self._entries:
+                    # Promoted by another session while we were reading
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                if value is not None:
+                    self.disk_hits += 1
+                    self._store(key, value, size)
+                    return value
+                if name in self._spilled:
+                    self._drop_spilled(name)
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Store value under key, evicting least recently used entries past the budget"""
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return value
+            self._store(key, value, size)
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, or compute and cache it"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for name in list(self._spilled):
+                self._drop_spilled(name)
+
+    def stats(self):
+        """Hit/miss counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'spilled_entries': len(self._spilled),
+                'spilled_bytes': self._spill_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    # Internal helpers, called with the lock held
+    def _store(self, key, value, size):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        if self._spill_name(key) in self._spilled:
+            self._drop_spilled(self._spill_name(key))
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, (old_value, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+            if self.spill_dir:
+                self._spill(old_key, old_value)
+
+    def _index_spill_dir(self):
+        """Pick up spill files left by an earlier process; drop other versions' files"""
+        files = []
+        for name in os.listdir(self.spill_dir):
+            if not name.endswith('.pkl') or '-' not in name:
+                continue
+            path = os.path.join(self.spill_dir, name)
+            if self.version is not None and name.split('-', 1)[0] != self.version:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._spilled[name] = size
+            self._spill_bytes += size
+        while self._spill_bytes > self.spill_max_bytes:
+            self._drop_spilled(next(iter(self._spilled)))
+
+    @staticmethod
+    def _spill_name(key):
+        version = key.split(':', 1)[0] if ':' in key else 'none'
+        return f"{version}-{hashlib.sha1(key.encode()).hexdigest()}.pkl"
+
+    def _spill(self, key, value):
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        if len(payload) > self.spill_max_bytes:
+            return
+        name = self._spill_name(key)
+        with open(os.path.join(self.spill_dir, name), 'wb') as f:
+            f.write(payload)
+        self._spilled[name] = len(payload)
+        self._spill_bytes += len(payload)
+        while self._spill_bytes > self.spill_max_bytes:
+            self._drop_spilled(next(iter(self._spilled)))
+
+    def _read_spilled(self, name):
+        """Unpickle a spill file (called without the lock); None if it is gone or unreadable"""
+        try:
+            with open(os.path.join(self.spill_dir, name), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _drop_spilled(self, name):
+        self._spill_bytes -= self._spilled.pop(name)
+        try:
+            os.remove(os.path.join(self.spill_dir, name))
+        except OSError:
+            pass
@@ -0,0 +1,295 @@
+"""
+Mergeable percentile sketches for sliced delivery and RFM statistics.
+
+TDigest is a small merging t-digest (k1 scale function) in NumPy and Moments
+keeps count/mean/M2/min/max that merge exactly (Chan et al.). SketchStore
+builds one digest and one moment summary per slice cell (e.g. state x month x
+seller) and keeps them as flat centroid/moment tables, so any slice is
+answered by selecting cells and merging their sketches instead of rescanning
+raw rows. The stores are exported next to the dashboard CSVs, and the
+dashboard only builds them from raw rows when no export is found.
+
+Usage:
+    python dashboard/sketches.py dashboard/dashboard_data
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_COMPRESSION = 200
+# Non-dimension columns of a saved moments table
+MOMENT_COLUMNS = ['metric', 'count', 'mean', 'm2', 'min', 'max', 'discrete', 'compression']
+
+
+def _compress(means, weights, compression):
+    """Merge sorted centroids so each spans at most one unit of the k1 scale"""
+    order = np.argsort(means, kind='mergesort')
+    means, weights = means[order], weights[order]
+    total = weights.sum()
+    if len(means) <= compression or total == 0:
+        return means, weights
+    q_mid = (np.cumsum(weights) - weights / 2) / total
+    k = compression / (2 * np.pi) * np.arcsin(np.clip(2 * q_mid - 1, -1, 1))
+    cluster = np.floor(k - k[0]).astype(np.int64)
+    merged_weights = np.bincount(cluster, weights=weights)
+    merged_sums = np.bincount(cluster, weights=means * weights)
+    keep = merged_weights > 0
+    return merged_sums[keep] / merged_weights[keep], merged_weights[keep]
+
+
+class TDigest:
+    """Mergeable quantile sketch"""
+
+    def __init__(self, means=(), weights=(), minimum=np.nan, maximum=np.nan,
+                 compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means, self.weights = _compress(np.asarray(means, dtype=float),
+                                             np.asarray(weights, dtype=float), compression)
+        self.min = minimum
+        self.max = maximum
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return cls(compression=compression)
+        return cls(values, np.ones(len(values)), values.min(), values.max(), compression)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def merge(self, *others):
+        digests = (self, *others)
+        return TDigest(
+            np.concatenate([d.means for d in digests]),
+            np.concatenate([d.weights for d in digests]),
+            np.nanmin([d.min for d in digests]) if any(d.count for d in digests) else np.nan,
+            np.nanmax([d.max for d in digests]) if any(d.count for d in digests) else np.nan,
+            self.compression
+        )
+
+    def quantile(self, q):
+        """Estimated quantile(s) for q in [0, 1]"""
+        q = np.asarray(q, dtype=float)
+        if not self.count:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xp = np.concatenate([[0.0], centers, [self.count]])
+        fp = np.concatenate([[self.min], self.means, [self.max]])
+        result = np.interp(q * self.count, xp, fp)
+        return result if q.ndim else float(result)
+
+
+class Moments:
+    """Exactly mergeable count, mean, variance, min and max"""
+
+    def __init__(self, count=0.0, mean=0.0, m2=0.0, minimum=np.nan, maximum=np.nan):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as pandas)"""
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else np.nan
+
+    @classmethod
+    def merge_arrays(cls, counts, means, m2s, mins, maxs):
+        """Merge many moment summaries at once"""
+        counts = np.asarray(counts, dtype=float)
+        total = counts.sum()
+        if not total:
+            return cls()
+        mean = float(np.dot(counts, means) / total)
+        m2 = float(np.sum(m2s) + np.dot(counts, (np.asarray(means) - mean) ** 2))
+        return cls(total, mean, m2, float(np.nanmin(mins)), float(np.nanmax(maxs)))
+
+
+class SketchStore:
+    """Per-cell t-digests and moments for a set of metrics, sliceable by dimension"""
+
+    def __init__(self, centroids, moments, dims, compression=DEFAULT_COMPRESSION, discrete=()):
+        # centroids: dims + metric, mean, weight; moments: dims + metric, count, mean, m2, min, max
+        self.centroids = centroids
+        self.moments = moments
+        self.dims = list(dims)
+        self.compression = compression
+        self.discrete = set(discrete)  # integer-valued metrics, their quantiles are rounded
+
+    @classmethod
+    def build(cls, frame, metrics, dims, compression=DEFAULT_COMPRESSION):
+        """Build sketches for each metric column of frame, one cell per dims combination"""
+        dims = list(dims)
+        centroid_parts, moment_parts, discrete = [], [], []
+        for metric in metrics:
+            data = frame[dims + [metric]].dropna(subset=[metric]).fillna({dim: 'unknown' for dim in dims})
+            if np.all(np.mod(data[metric].to_numpy(float), 1) == 0):
+                discrete.append(metric)
+            grouped = data.groupby(dims, observed=True, sort=False)[metric]
+
+            stats = grouped.agg(['count', 'mean', 'var', 'min', 'max']).reset_index()
+            stats['m2'] = stats['var'].fillna(0) * (stats['count'] - 1)
+            moment_parts.append(stats.drop(columns='var').assign(metric=metric))
+
+            # Small cells keep their raw values as unit centroids (collapsed on duplicates),
+            # large cells are compressed into a digest
+            values = data.groupby(dims + [metric], observed=True, sort=False).size()
+            values = values.rename('weight').reset_index().rename(columns={metric: 'mean'})
+            cell_sizes = values.groupby(dims, observed=True, sort=False)['weight'].transform('size')
+            small = values[cell_sizes <= compression]
+            large = values[cell_sizes > compression]
+            parts = [small]
+            for key, cell in large.groupby(dims, observed=True, sort=False):
+                means, weights = _compress(cell['mean'].to_numpy(float), cell['weight'].to_numpy(float),
+                                           compression)
+                key = key if isinstance(key, tuple) else (key,)
+                part = pd.DataFrame({'mean': means, 'weight': weights})
+                for dim, value in zip(dims, key):
+                    part[dim] = value
+                parts.append(part)
+            centroid_parts.append(pd.concat(parts, ignore_index=True).assign(metric=metric))
+
+        centroids = pd.concat(centroid_parts, ignore_index=True)
+        moments = pd.concat(moment_parts, ignore_index=True)
+        for table in (centroids, moments):
+            for col in dims + ['metric']:
+                table[col] = table[col].astype('category')
+        return cls(centroids, moments, dims, compression, discrete)
+
+    def values(self, dim, metric=None):
+        """Distinct values of a dimension present in the store"""
+        table = self.moments if metric is None else self.moments[self.moments['metric'] == metric]
+        return sorted(table[dim].dropna().unique().tolist())
+
+    def _mask(self, table, metric, filters):
+        mask = (table['metric'] == metric).to_numpy()
+        for dim, value in filters.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                mask &= table[dim].isin(list(value)).to_numpy()
+            else:
+                mask &= (table[dim] == value).to_numpy()
+        return mask
+
+    def query(self, metric, **filters):
+        """Merged (TDigest, Moments) for the cells matching filters (None = all)"""
+        cells = self.moments[self._mask(self.moments, metric, filters)]
+        moments = Moments.merge_arrays(cells['count'], cells['mean'], cells['m2'], cells['min'], cells['max'])
+        centroids = self.centroids[self._mask(self.centroids, metric, filters)]
+        digest = TDigest(centroids['mean'].to_numpy(), centroids['weight'].to_numpy(),
+                         moments.min, moments.max, self.compression)
+        return digest, moments
+
+    def summary(self, metric, quantiles=(0.5, 0.9, 0.99), **filters):
+        """Count, mean, std, min, max and the requested quantiles for a slice.
+
+        Quantiles of integer-valued metrics are rounded to whole values, since the
+        digest interpolates between centroids.
+        """
+        digest, moments = self.query(metric, **filters)
+        result = {'count': moments.count, 'mean': moments.mean if moments.count else np.nan,
+                  'std': moments.std, 'min': moments.min, 'max': moments.max}
+        values = np.atleast_1d(digest.quantile(list(quantiles)))
+        if metric in self.discrete:
+            values = np.round(values)
+        for q, value in zip(quantiles, values):
+            result[f'p{round(q * 100):g}'] = float(value)
+        return result
+
+    def save(self, directory, name):
+        """Write the store as <name>_centroids.csv and <name>_moments.csv.
+
+        The moments table also carries the compression and a per-metric discrete
+        flag, so load() restores the store exactly.
+        """
+        os.makedirs(directory, exist_ok=True)
+        moments = self.moments.assign(discrete=self.moments['metric'].isin(self.discrete).to_numpy(),
+                                      compression=self.compression)
+        self.centroids.to_csv(os.path.join(directory, f'{name}_centroids.csv'), index=False)
+        moments.to_csv(os.path.join(directory, f'{name}_moments.csv'), index=False)
+
+    @classmethod
+    def load(cls, source, name):
+        """Read a store written by save() from a directory or URL prefix"""
+        def path(suffix):
+            filename = f'{name}_{suffix}.csv'
+            return source.rstrip('/') + '/' + filename if '://' in source else os.path.join(source, filename)
+
+        moments = pd.read_csv(path('moments'))
+        dims = [col for col in moments.columns if col not in MOMENT_COLUMNS]
+        centroids = pd.read_csv(path('centroids'), dtype={dim: str for dim in dims})
+        discrete = moments.loc[moments['discrete'].astype(bool), 'metric'].unique()
+        compression = int(moments['compression'].iloc[0]) if len(moments) else DEFAULT_COMPRESSION
+        moments = moments.drop(columns=['discrete', 'compression']).astype({dim: str for dim in dims})
+        for table in (centroids, moments):
+            for col in dims + ['metric']:
+                table[col] = table[col].astype('category')
+        return cls(centroids, moments, dims, compression, discrete)
+
+
+def build_delivery_sketches(orders_df, delivery_df, compression=DEFAULT_COMPRESSION):
+    """Delivery time sketches per customer state x purchase month x seller.
+
+    Each order is attributed to the seller of its first item.
+    """
+    first_items = orders_df.sort_values(['order_id', 'order_item_id']) \
+        if 'order_item_id' in orders_df.columns else orders_df
+    first_items = first_items.drop_duplicates('order_id')
+    keys = pd.DataFrame({
+        'order_id': first_items['order_id'],
+        'state': first_items['customer_state'],
+        'month': first_items['order_purchase_timestamp'].dt.strftime('%Y-%m'),
+        'seller': first_items['seller_id'],
+    })
+    frame = delivery_df.merge(keys, on='order_id', how='inner')
+    return SketchStore.build(frame, ['actual_delivery_time', 'estimated_delivery_time'],
+                             ['state', 'month', 'seller'], compression)
+
+
+def build_rfm_sketches(orders_df, rfm_df, compression=DEFAULT_COMPRESSION):
+    """Recency/frequency/monetary sketches per customer state x last purchase month"""
+    last_orders = orders_df.sort_values('order_purchase_timestamp') \
+        .drop_duplicates('customer_unique_id', keep='last')
+    keys = pd.DataFrame({
+        'customer_unique_id': last_orders['customer_unique_id'],
+        'state': last_orders['customer_state'],
+        'month': last_orders['order_purchase_timestamp'].dt.strftime('%Y-%m'),
+    })
+    frame = rfm_df.merge(keys, on='customer_unique_id', how='left')
+    return SketchStore.build(frame, ['recency', 'frequency', 'monetary'], ['state', 'month'], compression)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export delivery and RFM sketches next to the dashboard CSVs")
+    parser.add_argument('data_dir', help="directory with orders_complete.csv, delivery_performance.csv "
+                                         "and rfm_analysis.csv")
+    parser.add_argument('-o', '--output', default=None, help="output directory (default: data_dir)")
+    parser.add_argument('--compression', type=int, default=DEFAULT_COMPRESSION)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    orders_df = pd.read_csv(os.path.join(args.data_dir, 'orders_complete.csv'),
+                            parse_dates=['order_purchase_timestamp'])
+    delivery_df = pd.read_csv(os.path.join(args.data_dir, 'delivery_performance.csv'))
+    rfm_df = pd.read_csv(os.path.join(args.data_dir, 'rfm_analysis.csv'))
+
+    output = args.output or args.data_dir
+    for name, store in (('delivery_sketches', build_delivery_sketches(orders_df, delivery_df, args.compression)),
+                        ('rfm_sketches', build_rfm_sketches(orders_df, rfm_df, args.compression))):
+        store.save(output, name)
+        print(f"{name}: {len(store.moments):,} cells, {len(store.centroids):,} centroids")
+    print(f"Sketches written to {output} ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())